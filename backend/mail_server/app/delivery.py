@@ -0,0 +1,258 @@
+import time
+import random
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+from prometheus_client import Counter, Histogram
+from outbox import Outbox, OutboxMessage
+from scheduler import BULK, LANES, MAIL_LANE_QUEUE_DEPTH, MailScheduler
+
+logger = logging.getLogger(__name__)
+RECORD_ATTEMPTS = 3
+OUTBOX_DELIVERIES = Counter(
+    "outbox_deliveries", "Outbox delivery attempts by outcome", ["outcome"]
+)
+OUTBOX_BATCH_SIZE = Histogram(
+    "outbox_batch_size",
+    "Messages delivered per SMTP session batch",
+    ["lane"],
+    buckets=(1, 2, 5, 10, 20, 50, 100),
+)
+
+
+class PermanentDeliveryError(Exception):
+    """Delivery failure that retrying cannot fix; the message is dead-lettered."""
+
+    pass
+
+
+class DeliveryWorkers:
+    """
+    Background workers that claim due messages from the outbox and deliver them.
+    Each lane has its own workers, and every send goes through the scheduler for
+    connection capacity and rate-limit tokens. Failed deliveries are retried
+    with exponential backoff and moved to the dead state after max_attempts or
+    on PermanentDeliveryError.
+    Workers of the lanes in batch_lanes claim up to batch_size messages,
+    waiting at most batch_max_wait for a batch to fill, and hand the whole
+    batch to deliver_batch, which sends it over one SMTP session.
+    Sent messages are purged after retention_seconds and dead ones after
+    dead_retention_seconds.
+    """
+
+    def __init__(
+        self,
+        outbox: Outbox,
+        deliver: Callable[[OutboxMessage], Awaitable[None]],
+        scheduler: MailScheduler,
+        lane_workers: Optional[Dict[str, int]] = None,
+        max_attempts=6,
+        base_delay=2.0,
+        max_delay=300.0,
+        poll_interval=1.0,
+        retention_seconds=7 * 24 * 3600,
+        dead_retention_seconds=30 * 24 * 3600,
+        deliver_batch: Optional[
+            Callable[
+                [List[OutboxMessage], Callable[[], Awaitable[None]]],
+                Awaitable[List[Optional[Exception]]],
+            ]
+        ] = None,
+        batch_size=1,
+        batch_max_wait=0.0,
+        batch_lanes: Iterable[str] = (BULK,),
+    ):
+        self.outbox = outbox
+        self.deliver = deliver
+        self.scheduler = scheduler
+        self.lane_workers = lane_workers or {lane: 2 for lane in LANES}
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self.dead_retention_seconds = dead_retention_seconds
+        self.deliver_batch = deliver_batch
+        self.batch_size = max(1, batch_size)
+        self.batch_max_wait = batch_max_wait
+        self.batch_lanes = set(batch_lanes)
+        self._wakeup = {lane: asyncio.Event() for lane in self.lane_workers}
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        recovered = await self.outbox.recover()
+        if recovered:
+            logger.info("requeued %d interrupted outbox messages", recovered)
+        self._tasks = [
+            asyncio.create_task(self._worker(lane), name=f"outbox-{lane}-{i}")
+            for lane, count in self.lane_workers.items()
+            for i in range(count)
+        ]
+        self._tasks.append(asyncio.create_task(self._housekeeping()))
+        self._tasks.append(asyncio.create_task(self._report_queue_depth()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self, lane: Optional[str] = None):
+        for name, wakeup in self._wakeup.items():
+            if lane is None or name == lane:
+                wakeup.set()
+
+    def backoff(self, attempts) -> float:
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return delay * random.uniform(0.8, 1.2)
+
+    def _batching(self, lane: str) -> bool:
+        return (
+            self.deliver_batch is not None
+            and self.batch_size > 1
+            and lane in self.batch_lanes
+        )
+
+    async def _worker(self, lane: str):
+        wakeup = self._wakeup[lane]
+        batching = self._batching(lane)
+        limit = self.batch_size if batching else 1
+        while True:
+            try:
+                messages = await self.outbox.claim(limit, lane)
+            except Exception as e:
+                logger.info("Failed to claim outbox messages: %s", e)
+                messages = []
+            if not messages:
+                wakeup.clear()
+                try:
+                    await asyncio.wait_for(wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                if batching:
+                    await self._process_batch(
+                        lane, await self._fill_batch(lane, messages)
+                    )
+                    continue
+                for message in messages:
+                    await self._process(message)
+            except Exception as e:
+                # Never let one bad iteration end the worker for good.
+                logger.exception("outbox %s worker iteration failed: %s", lane, e)
+
+    async def _fill_batch(self, lane: str, messages: List[OutboxMessage]):
+        wakeup = self._wakeup[lane]
+        deadline = time.monotonic() + self.batch_max_wait
+        while len(messages) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            wakeup.clear()
+            try:
+                await asyncio.wait_for(wakeup.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                messages += await self.outbox.claim(
+                    self.batch_size - len(messages), lane
+                )
+            except Exception as e:
+                logger.info("Failed to claim outbox messages: %s", e)
+                break
+        return messages
+
+    async def _process_batch(self, lane: str, messages: List[OutboxMessage]):
+        OUTBOX_BATCH_SIZE.labels(lane=lane).observe(len(messages))
+        try:
+            async with self.scheduler.session(
+                lane, [(m.created_at, m.attempts == 1) for m in messages]
+            ) as throttle:
+                errors = await self.deliver_batch(messages, throttle)
+        except Exception as e:
+            errors = [e] * len(messages)
+        for message, error in zip(messages, errors):
+            await self._record(message, error)
+
+    async def _process(self, message: OutboxMessage):
+        try:
+            async with self.scheduler.slot(
+                message.lane, message.created_at, message.attempts == 1
+            ):
+                await self.deliver(message)
+        except Exception as e:
+            await self._record(message, e)
+        else:
+            await self._record(message, None)
+
+    async def _record(self, message: OutboxMessage, error: Optional[Exception]):
+        """
+        Stores the outcome of one attempt. A failing status write is retried a
+        few times; if it keeps failing the message stays "sending" until the
+        next start requeues it, and the worker carries on.
+        """
+        for attempt in range(RECORD_ATTEMPTS):
+            try:
+                await self._store_outcome(message, error)
+                return
+            except Exception as e:
+                logger.info(
+                    "Failed to record outbox message %s (attempt %d): %s",
+                    message.id,
+                    attempt + 1,
+                    e,
+                )
+                if attempt + 1 < RECORD_ATTEMPTS:
+                    await asyncio.sleep(0.5 * 2**attempt)
+
+    async def _store_outcome(self, message: OutboxMessage, error: Optional[Exception]):
+        if error is None:
+            await self.outbox.mark_sent(message.id)
+            OUTBOX_DELIVERIES.labels(outcome="sent").inc()
+        elif isinstance(error, PermanentDeliveryError):
+            await self.outbox.mark_dead(message.id, str(error))
+            logger.info("outbox message %s dead-lettered: %s", message.id, error)
+            OUTBOX_DELIVERIES.labels(outcome="dead").inc()
+        elif message.attempts >= self.max_attempts:
+            logger.info(
+                "outbox message %s dead after %d attempts: %s",
+                message.id,
+                message.attempts,
+                error,
+            )
+            await self.outbox.mark_dead(message.id, str(error))
+            OUTBOX_DELIVERIES.labels(outcome="dead").inc()
+        else:
+            delay = self.backoff(message.attempts)
+            await self.outbox.mark_retry(message.id, time.time() + delay, str(error))
+            logger.info(
+                "outbox message %s failed, retrying in %.1fs: %s",
+                message.id,
+                delay,
+                error,
+            )
+            OUTBOX_DELIVERIES.labels(outcome="retry").inc()
+
+    async def _housekeeping(self):
+        while True:
+            try:
+                now = time.time()
+                purged = await self.outbox.purge(
+                    now - self.retention_seconds, now - self.dead_retention_seconds
+                )
+                if purged:
+                    logger.info("purged %d finished outbox messages", purged)
+            except Exception as e:
+                logger.info("Failed to purge outbox: %s", e)
+            await asyncio.sleep(3600)
+
+    async def _report_queue_depth(self):
+        while True:
+            try:
+                depths = await self.outbox.pending_counts()
+                for lane in LANES:
+                    MAIL_LANE_QUEUE_DEPTH.labels(lane=lane).set(depths.get(lane, 0))
+            except Exception as e:
+                logger.info("Failed to read outbox queue depth: %s", e)
+            await asyncio.sleep(5)
@@ -0,0 +1,165 @@
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Union
+from prometheus_client import Counter
+
+USER_EMAIL_LOOKUPS = Counter(
+    "user_email_lookups", "uid to email lookups by result", ["result"]
+)
+
+
+class UserNotFound(Exception):
+    """The user server does not know the uid; cached as a negative entry."""
+
+    pass
+
+
+class UserEmailCache:
+    """
+    TTL/LRU cache in front of a uid -> email lookup.
+    UserNotFound results are cached for negative_ttl seconds. Concurrent
+    misses for the same uid share a single lookup. With fetch_many (uids ->
+    {uid: email} for the uids that exist), get_many looks up its misses in
+    chunks of batch_size instead of one call per uid.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str], Awaitable[str]],
+        max_size=10000,
+        ttl=300.0,
+        negative_ttl=60.0,
+        fetch_many: Optional[Callable[[List[str]], Awaitable[Dict[str, str]]]] = None,
+        batch_size=500,
+    ):
+        self.fetch = fetch
+        self.fetch_many = fetch_many
+        self.batch_size = batch_size
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    def _cached(self, uid: str):
+        """
+        Returns the cached email, raises UserNotFound for a negative entry
+        and returns None on a miss.
+        """
+        entry = self._entries.get(uid)
+        if entry is None:
+            return None
+        expires_at, email = entry
+        if expires_at <= time.monotonic():
+            del self._entries[uid]
+            return None
+        self._entries.move_to_end(uid)
+        if email is None:
+            USER_EMAIL_LOOKUPS.labels(result="negative_hit").inc()
+            raise UserNotFound(f"user {uid} not found")
+        USER_EMAIL_LOOKUPS.labels(result="hit").inc()
+        return email
+
+    def _track(self, uid: str, pending: asyncio.Future):
+        self._pending[uid] = pending
+        pending.add_done_callback(lambda _: self._pending.pop(uid, None))
+
+    async def get(self, uid: str) -> str:
+        email = self._cached(uid)
+        if email is not None:
+            return email
+
+        pending = self._pending.get(uid)
+        if pending is None:
+            USER_EMAIL_LOOKUPS.labels(result="miss").inc()
+            pending = asyncio.ensure_future(self._load(uid))
+            self._track(uid, pending)
+        else:
+            USER_EMAIL_LOOKUPS.labels(result="coalesced").inc()
+        # A cancelled caller must not cancel the lookup other callers wait on.
+        return await asyncio.shield(pending)
+
+    async def _load(self, uid: str) -> str:
+        try:
+            email = await self.fetch(uid)
+        except UserNotFound:
+            self._store(uid, None, self.negative_ttl)
+            raise
+        self._store(uid, email, self.ttl)
+        return email
+
+    async def get_many(self, uids: Iterable[str]) -> Dict[str, Union[str, Exception]]:
+        """
+        Resolves several uids at once, each uid only once. Maps every uid to its
+        email or to the exception its lookup raised.
+        """
+        unique = list(dict.fromkeys(uids))
+        if self.fetch_many is None:
+            values = await asyncio.gather(
+                *(self.get(uid) for uid in unique), return_exceptions=True
+            )
+            return dict(zip(unique, values))
+
+        results: Dict[str, Union[str, Exception]] = {}
+        waiting: Dict[str, asyncio.Future] = {}
+        missing = []
+        for uid in unique:
+            try:
+                email = self._cached(uid)
+            except UserNotFound as e:
+                results[uid] = e
+                continue
+            if email is not None:
+                results[uid] = email
+            elif uid in self._pending:
+                USER_EMAIL_LOOKUPS.labels(result="coalesced").inc()
+                waiting[uid] = self._pending[uid]
+            else:
+                USER_EMAIL_LOOKUPS.labels(result="miss").inc()
+                missing.append(uid)
+
+        for start in range(0, len(missing), self.batch_size):
+            chunk = missing[start : start + self.batch_size]
+            batch = asyncio.ensure_future(self._load_many(chunk))
+            for uid in chunk:
+                # Per-uid futures so that concurrent get() calls join the batch.
+                waiting[uid] = asyncio.ensure_future(self._from_batch(batch, uid))
+                self._track(uid, waiting[uid])
+
+        values = await asyncio.gather(
+            *(asyncio.shield(pending) for pending in waiting.values()),
+            return_exceptions=True,
+        )
+        results.update(zip(waiting, values))
+        return {uid: results[uid] for uid in unique}
+
+    async def _load_many(self, uids: List[str]) -> Dict[str, str]:
+        found = await self.fetch_many(uids)
+        for uid in uids:
+            if uid in found:
+                self._store(uid, found[uid], self.ttl)
+            else:
+                self._store(uid, None, self.negative_ttl)
+        return found
+
+    @staticmethod
+    async def _from_batch(batch: asyncio.Future, uid: str) -> str:
+        found = await batch
+        if uid not in found:
+            raise UserNotFound(f"user {uid} not found")
+        return found[uid]
+
+    def _store(self, uid, email, ttl):
+        if ttl <= 0:
+            return
+        self._entries[uid] = (time.monotonic() + ttl, email)
+        self._entries.move_to_end(uid)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, uid: str):
+        self._entries.pop(uid, None)
+
+    def clear(self):
+        self._entries.clear()
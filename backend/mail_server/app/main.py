@@ -1,9 +1,17 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, status
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel, EmailStr
-from send_email import send_gmail
+from typing import Dict, List, Optional, Tuple
+from send_email import send_gmail, send_gmail_batch
 from smtp_connection_pool import *
+from outbox import Outbox, OutboxMessage
+from delivery import DeliveryWorkers, PermanentDeliveryError
+from email_cache import UserEmailCache, UserNotFound
+from templates import TemplateRegistry
+from scheduler import MailScheduler, INTERACTIVE, BULK
 import os
+import asyncio
 import httpx
 from prometheus_fastapi_instrumentator import Instrumentator
 import logging
@@ -11,20 +19,102 @@ import logging
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 smtp_cp = None
+outbox = None
+workers = None
+scheduler = None
+http_client = None
+email_cache = None
+templates = None
 
 
 @asynccontextmanager
 async def startup_event(app: FastAPI):
-    global smtp_cp
+    global smtp_cp, outbox, workers, scheduler, http_client, email_cache, templates
     GMAIL_USER = os.getenv("GMAIL_USER")
     GMAIL_PASSWORD = os.getenv("GMAIL_PASSWORD")
     if not GMAIL_USER or not GMAIL_PASSWORD:
         raise ValueError("Gmail credentials are not configured on the server.")
-    smtp_config = SMTPConfig("smtp.gmail.com", 465, GMAIL_USER, GMAIL_PASSWORD)
-    smtp_cp = SMTPConnectionPool(smtp_config, pool_size=5)
-    logger.info("SMTP server connected and logged in")
+    templates = TemplateRegistry(GMAIL_USER)
+    smtp_config = SMTPConfig(
+        os.getenv("SMTP_HOST", "smtp.gmail.com"),
+        int(os.getenv("SMTP_PORT", "465")),
+        GMAIL_USER,
+        GMAIL_PASSWORD,
+        timeout=float(os.getenv("SMTP_TIMEOUT", "10")),
+        use_tls=os.getenv("SMTP_USE_TLS", "true").lower() in ("1", "true", "yes"),
+    )
+    pool_size = int(os.getenv("SMTP_POOL_MAX_SIZE", "5"))
+    smtp_cp = SMTPConnectionPool(
+        smtp_config,
+        min_size=int(os.getenv("SMTP_POOL_MIN_SIZE", "1")),
+        max_size=pool_size,
+        acquire_timeout=float(os.getenv("SMTP_ACQUIRE_TIMEOUT", "10")),
+        idle_timeout=float(os.getenv("SMTP_IDLE_TIMEOUT", "300")),
+        max_age=float(os.getenv("SMTP_MAX_AGE", "1800")),
+        health_check_interval=float(os.getenv("SMTP_HEALTH_CHECK_INTERVAL", "60")),
+        ready_size=int(os.getenv("SMTP_POOL_READY_SIZE", "1")),
+    )
+    await smtp_cp.initialize()
+    if smtp_cp.ready:
+        logger.info(
+            "SMTP pool ready with %d connections in %.2fs",
+            smtp_cp.size,
+            smtp_cp.startup_seconds,
+        )
+    else:
+        logger.info("SMTP pool is not ready yet, continuing to connect")
+    http_client = httpx.AsyncClient(
+        base_url=user_server_url,
+        timeout=float(os.getenv("USER_SERVER_TIMEOUT", "5")),
+        limits=httpx.Limits(
+            max_connections=int(os.getenv("USER_SERVER_MAX_CONNECTIONS", "20")),
+            max_keepalive_connections=int(os.getenv("USER_SERVER_MAX_KEEPALIVE", "10")),
+        ),
+    )
+    email_cache = UserEmailCache(
+        fetch_user_email,
+        max_size=int(os.getenv("USER_EMAIL_CACHE_SIZE", "10000")),
+        ttl=float(os.getenv("USER_EMAIL_CACHE_TTL", "300")),
+        negative_ttl=float(os.getenv("USER_EMAIL_CACHE_NEGATIVE_TTL", "60")),
+        fetch_many=fetch_user_emails,
+        batch_size=int(os.getenv("USER_EMAIL_BATCH_SIZE", "500")),
+    )
+    outbox = Outbox(
+        os.getenv("OUTBOX_PATH", "/data/outbox.sqlite3"),
+        os.getenv("OUTBOX_SENSITIVE_FORMATS", "SIGNUP_AUTH,2FA_AUTH").split(","),
+    )
+    scheduler = MailScheduler(
+        os.getenv("MAIL_INTERACTIVE_FORMATS", "SIGNUP_AUTH,2FA_AUTH").split(","),
+        pool_size=pool_size,
+        reserved_connections=int(os.getenv("MAIL_RESERVED_CONNECTIONS", "1")),
+        rate_per_second=float(os.getenv("MAIL_RATE_PER_SECOND", "0")),
+        burst=float(os.getenv("MAIL_RATE_BURST", "10")),
+        interactive_token_reserve=float(os.getenv("MAIL_INTERACTIVE_TOKENS", "1")),
+    )
+    workers = DeliveryWorkers(
+        outbox,
+        deliver,
+        scheduler,
+        lane_workers={
+            INTERACTIVE: int(os.getenv("MAIL_INTERACTIVE_WORKERS", "2")),
+            BULK: int(os.getenv("MAIL_BULK_WORKERS", "4")),
+        },
+        max_attempts=int(os.getenv("OUTBOX_MAX_ATTEMPTS", "6")),
+        base_delay=float(os.getenv("OUTBOX_RETRY_BASE_DELAY", "2")),
+        max_delay=float(os.getenv("OUTBOX_RETRY_MAX_DELAY", "300")),
+        dead_retention_seconds=float(
+            os.getenv("OUTBOX_DEAD_RETENTION", str(30 * 24 * 3600))
+        ),
+        deliver_batch=deliver_batch,
+        batch_size=int(os.getenv("MAIL_BATCH_SIZE", "20")),
+        batch_max_wait=float(os.getenv("MAIL_BATCH_MAX_WAIT", "0.5")),
+    )
+    await workers.start()
     yield
-    smtp_cp.quit()
+    await workers.stop()
+    outbox.close()
+    await http_client.aclose()
+    await smtp_cp.quit()
 
 
 app = FastAPI(lifespan=startup_event)
@@ -44,6 +134,8 @@ class EmailRequest(BaseModel):
 
 
 user_server_url = os.getenv("USER_SERVER_URL", "http://user-server:8000")
+status_batch_max = int(os.getenv("MAIL_STATUS_BATCH_MAX", "500"))
+digest_enabled = os.getenv("MAIL_DIGEST", "true").lower() in ("1", "true", "yes")
 
 
 @app.get("/email")
@@ -51,67 +143,284 @@ def health():
     return {"status": "ok"}
 
 
-@app.post("/email/users")
-async def send_email_users(email: EmailRequest):
-    logger.info("received email request: %s", email)
-    try:
-        email_to_send = EmailSchema(
-            to=email.to,
-            subject=f"[{email.format}] {email.to}",
-            context=str(email.parameters),
-        )
-        send_gmail(
-            smtp_cp=smtp_cp,
-            to=email_to_send.to,
-            subject=email_to_send.subject,
-            context=email_to_send.context,
+@app.get("/email/ready")
+def ready():
+    content = {
+        "ready": smtp_cp.ready,
+        "connections": smtp_cp.size,
+        "startup_seconds": smtp_cp.startup_seconds,
+    }
+    if not smtp_cp.ready:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=content
         )
-        return {"message": "Email sent successfully"}
-    except ValueError as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+    return content
+
+
+class EmailAcceptedResponse(BaseModel):
+    message: str
+    message_id: str
+
+
+class EmailBatchRequest(BaseModel):
+    events: List[EmailRequest]
+
+
+class EmailBatchItemResult(BaseModel):
+    index: int
+    to: str
+    status: str
+    message_id: Optional[str] = None
+    detail: Optional[str] = None
+
+
+class EmailBatchResponse(BaseModel):
+    accepted: int
+    rejected: int
+    recipients: int
+    results: List[EmailBatchItemResult]
+
+
+class EmailStatusResponse(BaseModel):
+    message_id: str
+    status: str
+    attempts: int
+    last_error: Optional[str]
+    created_at: float
+    updated_at: float
+    next_attempt_at: float
+
+
+async def fetch_user_email(uid: str) -> str:
+    logger.info("fetching email of user %s", uid)
+    response = await http_client.get("/users/email/", params={"uid": uid})
+    if response.status_code in (
+        status.HTTP_400_BAD_REQUEST,
+        status.HTTP_404_NOT_FOUND,
+    ):
+        raise UserNotFound(f"Failed to get user email: {response.text}")
+    response.raise_for_status()
+    return response.json()["email"]
+
+
+async def fetch_user_emails(uids: List[str]) -> Dict[str, str]:
+    """
+    Looks up several uids with one POST /users/emails/ call. Uids the user
+    server does not know (or cannot parse) are left out of the result.
+    """
+    logger.info("fetching emails of %d users", len(uids))
+    response = await http_client.post("/users/emails/", json={"uids": uids})
+    response.raise_for_status()
+    return response.json()["emails"]
+
+
+async def resolve_recipient(message: OutboxMessage) -> str:
+    """
+    Status messages carry a user uid that is resolved to an email address here,
+    at delivery time.
+    """
+    if message.kind != "status":
+        return message.recipient
+    try:
+        return await email_cache.get(message.recipient)
+    except UserNotFound as e:
+        raise PermanentDeliveryError(str(e))
+
+
+def render(receiver: str, message: OutboxMessage) -> bytes:
+    return templates.render(
+        receiver, message.format, message.recipient, message.parameters
+    )
+
+
+def render_digest(receiver: str, messages: List[OutboxMessage]) -> bytes:
+    return templates.render_digest(
+        receiver,
+        messages[0].recipient,
+        [(message.format, message.parameters) for message in messages],
+    )
+
+
+async def deliver(message: OutboxMessage):
+    receiver = await resolve_recipient(message)
+    await send_gmail(smtp_cp=smtp_cp, to=receiver, message=render(receiver, message))
+
+
+async def deliver_batch(messages: List[OutboxMessage], throttle):
+    """
+    Sends a batch of outbox messages over one SMTP session. With MAIL_DIGEST
+    on, messages of the batch that go to the same address are merged into
+    one digest mail. Returns one error (or None) per message.
+    """
+    results: List[Optional[Exception]] = [None] * len(messages)
+    # Warm the cache for every uid of the batch in one user server call.
+    await email_cache.get_many(
+        message.recipient for message in messages if message.kind == "status"
+    )
+    receivers = await asyncio.gather(
+        *(resolve_recipient(message) for message in messages), return_exceptions=True
+    )
+    groups: List[Tuple[str, List[int]]] = []
+    by_receiver: Dict[str, List[int]] = {}
+    for i, receiver in enumerate(receivers):
+        if isinstance(receiver, Exception):
+            results[i] = receiver
+            continue
+        indexes = by_receiver.get(receiver) if digest_enabled else None
+        if indexes is None:
+            indexes = by_receiver[receiver] = []
+            groups.append((receiver, indexes))
+        indexes.append(i)
+
+    mails = []
+    for receiver, indexes in groups:
+        if len(indexes) == 1:
+            data = render(receiver, messages[indexes[0]])
+        else:
+            data = render_digest(receiver, [messages[i] for i in indexes])
+        mails.append((receiver, data))
+    if not mails:
+        return results
+
+    errors = await send_gmail_batch(smtp_cp, mails, throttle)
+    for (_, indexes), error in zip(groups, errors):
+        for i in indexes:
+            results[i] = error
+    return results
+
+
+async def enqueue_email(kind: str, email: EmailRequest):
+    lane = scheduler.lane_for(email.format)
+    try:
+        message_id = await outbox.enqueue(
+            kind, email.to, email.format, email.parameters, lane
         )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to send email: {e}",
+            detail=f"Failed to queue email: {e}",
         )
+    workers.notify(lane)
+    return {"message": "Email queued", "message_id": message_id}
 
 
-@app.post("/email/status")
-async def send_email_status(email: EmailRequest):
+@app.post(
+    "/email/users",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=EmailAcceptedResponse,
+)
+async def send_email_users(email: EmailRequest):
     logger.info("received email request: %s", email)
-    url_for_email = f"{user_server_url}/users/email/?uid={email.to}"
-    logger.info("fetching email from URL: %s", url_for_email)
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url_for_email)
-            response.raise_for_status()
-            receiver = response.json()["email"]
-
-        email_to_send = EmailSchema(
-            to=receiver,
+        EmailSchema(
+            to=email.to,
             subject=f"[{email.format}] {email.to}",
             context=str(email.parameters),
         )
-        send_gmail(
-            smtp_cp=smtp_cp,
-            to=email_to_send.to,
-            subject=email_to_send.subject,
-            context=email_to_send.context,
-        )
-        return {"message": "Email sent successfully"}
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         )
-    except httpx.HTTPStatusError as e:
+    return await enqueue_email("users", email)
+
+
+@app.post(
+    "/email/status",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=EmailAcceptedResponse,
+)
+async def send_email_status(email: EmailRequest):
+    logger.info("received email request: %s", email)
+    return await enqueue_email("status", email)
+
+
+@app.post(
+    "/email/status/batch",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=EmailBatchResponse,
+    response_model_exclude_none=True,
+)
+async def send_email_status_batch(batch: EmailBatchRequest):
+    """
+    Queues many status notifications in one call. All uids are resolved up
+    front (each distinct uid once); events for unknown users are rejected,
+    the rest are queued grouped per recipient in a single outbox transaction
+    so that bulk delivery can merge them into digests.
+    """
+    events = batch.events
+    logger.info("received status batch of %d events", len(events))
+    if len(events) > status_batch_max:
         raise HTTPException(
-            status_code=e.response.status_code,
-            detail=f"Failed to get user email: {e.response.text}",
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many events: {len(events)} (max {status_batch_max})",
+        )
+    receivers = await email_cache.get_many(event.to for event in events)
+
+    results: List[Optional[dict]] = [None] * len(events)
+    groups: Dict[str, List[int]] = {}
+    for i, event in enumerate(events):
+        receiver = receivers[event.to]
+        if isinstance(receiver, UserNotFound):
+            results[i] = {
+                "index": i,
+                "to": event.to,
+                "status": "rejected",
+                "detail": str(receiver),
+            }
+            continue
+        # Lookups that failed for other reasons are retried at delivery time.
+        key = event.to if isinstance(receiver, Exception) else receiver
+        groups.setdefault(key, []).append(i)
+
+    order = [i for indexes in groups.values() for i in indexes]
+    try:
+        message_ids = await outbox.enqueue_many(
+            [
+                (
+                    "status",
+                    events[i].to,
+                    events[i].format,
+                    events[i].parameters,
+                    scheduler.lane_for(events[i].format),
+                )
+                for i in order
+            ]
         )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to send email: {e}",
+            detail=f"Failed to queue email: {e}",
+        )
+    for i, message_id in zip(order, message_ids):
+        results[i] = {
+            "index": i,
+            "to": events[i].to,
+            "status": "queued",
+            "message_id": message_id,
+        }
+        workers.notify(scheduler.lane_for(events[i].format))
+
+    return {
+        "accepted": len(order),
+        "rejected": len(events) - len(order),
+        "recipients": len(groups),
+        "results": results,
+    }
+
+
+@app.get("/email/messages/{message_id}", response_model=EmailStatusResponse)
+async def get_email_message(message_id: str):
+    message = await outbox.get(message_id)
+    if message is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Message not found"
         )
+    return {
+        "message_id": message.id,
+        "status": message.status,
+        "attempts": message.attempts,
+        "last_error": message.last_error,
+        "created_at": message.created_at,
+        "updated_at": message.updated_at,
+        "next_attempt_at": message.next_attempt_at,
+    }
@@ -0,0 +1,263 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import asyncio
+import logging
+import threading
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+DEAD = "dead"
+
+# Formats whose parameters carry one-time codes; cleared once a row is final.
+SENSITIVE_FORMATS = ("SIGNUP_AUTH", "2FA_AUTH")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    format TEXT NOT NULL,
+    parameters TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    last_error TEXT,
+    lane TEXT NOT NULL DEFAULT 'bulk'
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt_at);
+"""
+
+
+class OutboxMessage(NamedTuple):
+    id: str
+    kind: str
+    recipient: str
+    format: str
+    parameters: list
+    status: str
+    attempts: int
+    next_attempt_at: float
+    created_at: float
+    updated_at: float
+    last_error: Optional[str]
+    lane: str = "bulk"
+
+    @classmethod
+    def from_row(cls, row):
+        values = dict(row)
+        values["parameters"] = json.loads(values["parameters"])
+        return cls(**values)
+
+
+class Outbox:
+    """
+    Durable local mail queue backed by SQLite in WAL mode.
+    Blocking SQLite calls are run on worker threads through asyncio.to_thread.
+    Parameters of sensitive_formats are replaced with an empty list when a
+    message is sent or dead-lettered, so codes do not outlive their delivery.
+    """
+
+    def __init__(self, path: str, sensitive_formats: Sequence[str] = SENSITIVE_FORMATS):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.sensitive_formats = tuple(sensitive_formats)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        columns = {
+            row["name"] for row in self._conn.execute("PRAGMA table_info(outbox)")
+        }
+        if "lane" not in columns:
+            self._conn.execute(
+                "ALTER TABLE outbox ADD COLUMN lane TEXT NOT NULL DEFAULT 'bulk'"
+            )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_outbox_lane_due"
+            " ON outbox (lane, status, next_attempt_at)"
+        )
+
+    def _enqueue(self, kind, recipient, format, parameters, lane) -> str:
+        return self._enqueue_many([(kind, recipient, format, parameters, lane)])[0]
+
+    def _enqueue_many(self, items) -> List[str]:
+        now = time.time()
+        rows = [
+            (
+                uuid.uuid4().hex,
+                kind,
+                recipient,
+                format,
+                json.dumps(parameters),
+                PENDING,
+                now,
+                now,
+                now,
+                lane,
+            )
+            for kind, recipient, format, parameters, lane in items
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO outbox (id, kind, recipient, format, parameters,"
+                    " status, next_attempt_at, created_at, updated_at, lane)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [row[0] for row in rows]
+
+    def _claim(self, limit, lane) -> List[OutboxMessage]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if lane is None:
+                    rows = self._conn.execute(
+                        "SELECT * FROM outbox WHERE status = ? AND next_attempt_at <= ?"
+                        " ORDER BY next_attempt_at LIMIT ?",
+                        (PENDING, now, limit),
+                    ).fetchall()
+                else:
+                    rows = self._conn.execute(
+                        "SELECT * FROM outbox WHERE lane = ? AND status = ?"
+                        " AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?",
+                        (lane, PENDING, now, limit),
+                    ).fetchall()
+                self._conn.executemany(
+                    "UPDATE outbox SET status = ?, attempts = attempts + 1,"
+                    " updated_at = ? WHERE id = ?",
+                    [(SENDING, now, row["id"]) for row in rows],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [
+            OutboxMessage.from_row(row)._replace(
+                status=SENDING, attempts=row["attempts"] + 1
+            )
+            for row in rows
+        ]
+
+    def _update(self, message_id, status, next_attempt_at=None, error=None):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET status = ?,"
+                " next_attempt_at = COALESCE(?, next_attempt_at),"
+                " last_error = ?, updated_at = ? WHERE id = ?",
+                (status, next_attempt_at, error, now, message_id),
+            )
+            if status in (SENT, DEAD) and self.sensitive_formats:
+                placeholders = ", ".join("?" * len(self.sensitive_formats))
+                self._conn.execute(
+                    "UPDATE outbox SET parameters = '[]'"
+                    f" WHERE id = ? AND format IN ({placeholders})",
+                    (message_id, *self.sensitive_formats),
+                )
+
+    def _get(self, message_id) -> Optional[OutboxMessage]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM outbox WHERE id = ?", (message_id,)
+            ).fetchone()
+        return OutboxMessage.from_row(row) if row else None
+
+    def _recover(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE outbox SET status = ?, updated_at = ? WHERE status = ?",
+                (PENDING, time.time(), SENDING),
+            )
+        return cursor.rowcount
+
+    def _pending_counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT lane, COUNT(*) AS depth FROM outbox WHERE status = ?"
+                " GROUP BY lane",
+                (PENDING,),
+            ).fetchall()
+        return {row["lane"]: row["depth"] for row in rows}
+
+    def _purge(self, older_than, dead_older_than=None) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM outbox WHERE status = ? AND updated_at < ?",
+                (SENT, older_than),
+            )
+            purged = cursor.rowcount
+            if dead_older_than is not None:
+                cursor = self._conn.execute(
+                    "DELETE FROM outbox WHERE status = ? AND updated_at < ?",
+                    (DEAD, dead_older_than),
+                )
+                purged += cursor.rowcount
+        return purged
+
+    async def enqueue(self, kind, recipient, format, parameters, lane="bulk") -> str:
+        return await asyncio.to_thread(
+            self._enqueue, kind, recipient, format, parameters, lane
+        )
+
+    async def enqueue_many(
+        self, items: Sequence[Tuple[str, str, str, list, str]]
+    ) -> List[str]:
+        """items are (kind, recipient, format, parameters, lane), one transaction."""
+        return await asyncio.to_thread(self._enqueue_many, items)
+
+    async def claim(self, limit=1, lane=None) -> List[OutboxMessage]:
+        return await asyncio.to_thread(self._claim, limit, lane)
+
+    async def mark_sent(self, message_id):
+        await asyncio.to_thread(self._update, message_id, SENT)
+
+    async def mark_retry(self, message_id, next_attempt_at, error):
+        await asyncio.to_thread(
+            self._update, message_id, PENDING, next_attempt_at, error
+        )
+
+    async def mark_dead(self, message_id, error):
+        await asyncio.to_thread(self._update, message_id, DEAD, None, error)
+
+    async def get(self, message_id) -> Optional[OutboxMessage]:
+        return await asyncio.to_thread(self._get, message_id)
+
+    async def recover(self) -> int:
+        return await asyncio.to_thread(self._recover)
+
+    async def pending_counts(self) -> Dict[str, int]:
+        return await asyncio.to_thread(self._pending_counts)
+
+    async def purge(self, older_than, dead_older_than=None) -> int:
+        """Deletes sent rows last updated before older_than and, if given,
+        dead rows last updated before dead_older_than."""
+        return await asyncio.to_thread(self._purge, older_than, dead_older_than)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,148 @@
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+from prometheus_client import Gauge, Histogram
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+LANES = (INTERACTIVE, BULK)
+
+MAIL_LANE_WAIT = Histogram(
+    "mail_lane_wait_seconds",
+    "Time from enqueue until a message gets a send slot (first attempt)",
+    ["lane"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+MAIL_LANE_SLOT_WAIT = Histogram(
+    "mail_lane_slot_wait_seconds",
+    "Time spent waiting for connection capacity and rate-limit tokens",
+    ["lane"],
+)
+MAIL_LANE_QUEUE_DEPTH = Gauge(
+    "mail_lane_queue_depth", "Pending outbox messages per lane", ["lane"]
+)
+MAIL_LANE_IN_FLIGHT = Gauge(
+    "mail_lane_in_flight", "Messages currently being sent per lane", ["lane"]
+)
+
+
+class TokenBucket:
+    """
+    Async token bucket. rate is tokens per second; rate <= 0 disables limiting.
+    Callers may ask to leave `reserve` tokens in the bucket so that a
+    higher-priority caller can still get one immediately.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._tokens = self.burst
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+
+    async def acquire(self, reserve: float = 0.0):
+        if self.rate <= 0:
+            return
+        reserve = min(reserve, self.burst - 1)
+        while True:
+            async with self._lock:
+                self._refill()
+                if self._tokens >= 1 + reserve:
+                    self._tokens -= 1
+                    return
+                missing = 1 + reserve - self._tokens
+            await asyncio.sleep(missing / self.rate)
+
+
+class MailScheduler:
+    """
+    Maps mail formats to priority lanes and gates every send on
+    - the provider-wide token bucket (bulk mail leaves `interactive_token_reserve`
+      tokens for auth mail), and
+    - the connection capacity of the lane (bulk mail may use at most
+      pool_size - reserved_connections SMTP connections at once).
+    """
+
+    def __init__(
+        self,
+        interactive_formats: Iterable[str],
+        pool_size: int,
+        reserved_connections: int = 1,
+        rate_per_second: float = 0.0,
+        burst: float = 10.0,
+        interactive_token_reserve: float = 1.0,
+    ):
+        self.interactive_formats = set(interactive_formats)
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.interactive_token_reserve = interactive_token_reserve
+        reserved = min(max(0, reserved_connections), pool_size - 1)
+        self._capacity: Dict[str, Optional[asyncio.Semaphore]] = {
+            INTERACTIVE: None,
+            BULK: asyncio.Semaphore(max(1, pool_size - reserved)),
+        }
+
+    def lane_for(self, format: str) -> str:
+        return INTERACTIVE if format in self.interactive_formats else BULK
+
+    @asynccontextmanager
+    async def slot(self, lane: str, created_at: float, first_attempt: bool):
+        start = time.time()
+        capacity = self._capacity.get(lane)
+        if capacity is not None:
+            await capacity.acquire()
+        try:
+            await self.bucket.acquire(
+                0.0 if lane == INTERACTIVE else self.interactive_token_reserve
+            )
+            now = time.time()
+            MAIL_LANE_SLOT_WAIT.labels(lane=lane).observe(now - start)
+            if first_attempt:
+                MAIL_LANE_WAIT.labels(lane=lane).observe(now - created_at)
+            MAIL_LANE_IN_FLIGHT.labels(lane=lane).inc()
+            try:
+                yield
+            finally:
+                MAIL_LANE_IN_FLIGHT.labels(lane=lane).dec()
+        finally:
+            if capacity is not None:
+                capacity.release()
+
+    @asynccontextmanager
+    async def session(self, lane: str, messages: Sequence[Tuple[float, bool]]):
+        """
+        Holds one unit of connection capacity for a batch of messages sent over
+        a single SMTP session. messages are (created_at, first_attempt) pairs.
+        Yields a coroutine function the sender awaits before every outgoing
+        mail to take a rate-limit token.
+        """
+        start = time.time()
+        capacity = self._capacity.get(lane)
+        if capacity is not None:
+            await capacity.acquire()
+        reserve = 0.0 if lane == INTERACTIVE else self.interactive_token_reserve
+
+        async def throttle():
+            await self.bucket.acquire(reserve)
+
+        try:
+            now = time.time()
+            MAIL_LANE_SLOT_WAIT.labels(lane=lane).observe(now - start)
+            for created_at, first_attempt in messages:
+                if first_attempt:
+                    MAIL_LANE_WAIT.labels(lane=lane).observe(now - created_at)
+            MAIL_LANE_IN_FLIGHT.labels(lane=lane).inc(len(messages))
+            try:
+                yield throttle
+            finally:
+                MAIL_LANE_IN_FLIGHT.labels(lane=lane).dec(len(messages))
+        finally:
+            if capacity is not None:
+                capacity.release()
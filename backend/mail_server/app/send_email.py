@@ -1,37 +1,86 @@
 from smtp_connection_pool import SMTPConnectionPool, SMTPConnection
+from typing import Awaitable, Callable, List, Optional, Tuple
+from prometheus_client import Counter
 import logging
 
 logger = logging.getLogger(__name__)
+EMAIL_SEND_RETRIES = Counter(
+    "email_send_retries", "Resends on the same pooled connection after a failed send"
+)
 
 
-def send_gmail(smtp_cp: SMTPConnectionPool, to: str, subject: str, context: str):
-    logger.info("send mail to %s with subject %s", to, subject)
+async def send_gmail(smtp_cp: SMTPConnectionPool, to: str, message: bytes):
+    logger.info("send mail to %s", to)
     if smtp_cp is None:
         raise ValueError("SMTP Connection Pool is not initialized")
 
     trial = 3
-    conn = smtp_cp.acquire()
-    while trial > 0:
-        if _send_to_connection(conn, to, subject, context):
-            break
-        else:
-            trial -= 1
+    conn = await smtp_cp.acquire()
+    try:
+        while trial > 0:
+            if await _send_to_connection(conn, to, message):
+                break
+            else:
+                trial -= 1
+                try:
+                    await conn.connect()
+                except Exception as e:
+                    logger.info("Failed to reconnect SMTP connection: %s", e)
+                if trial > 0:
+                    EMAIL_SEND_RETRIES.inc()
+                    logger.info("Retrying to send email, attempts left: %d", trial)
+                else:
+                    logger.info("All attempts to send email failed")
+    finally:
+        await smtp_cp.release(conn)
+    if trial == 0:
+        raise RuntimeError("Failed to send email after multiple attempts")
+
+
+async def send_gmail_batch(
+    smtp_cp: SMTPConnectionPool,
+    mails: List[Tuple[str, bytes]],
+    throttle: Optional[Callable[[], Awaitable[None]]] = None,
+) -> List[Optional[Exception]]:
+    """
+    Sends rendered (to, message) mails back to back over one pooled connection.
+    Returns one entry per mail: None when it was sent, otherwise the error.
+    A failed send reconnects once and retries that mail; if the reconnect
+    fails, the rest of the batch is reported as failed.
+    """
+    if smtp_cp is None:
+        raise ValueError("SMTP Connection Pool is not initialized")
+
+    results: List[Optional[Exception]] = []
+    conn = await smtp_cp.acquire()
+    try:
+        for to, message in mails:
+            logger.info("send mail to %s", to)
+            if throttle is not None:
+                await throttle()
+            if await _send_to_connection(conn, to, message):
+                results.append(None)
+                continue
             try:
-                conn.connect()
+                await conn.connect()
             except Exception as e:
                 logger.info("Failed to reconnect SMTP connection: %s", e)
-            if trial > 0:
-                logger.info("Retrying to send email, attempts left: %d", trial)
+                error = RuntimeError("Failed to reconnect SMTP connection")
+                results.extend([error] * (len(mails) - len(results)))
+                break
+            EMAIL_SEND_RETRIES.inc()
+            if await _send_to_connection(conn, to, message):
+                results.append(None)
             else:
-                logger.info("All attempts to send email failed")
-    smtp_cp.release(conn)
-    if trial == 0:
-        raise RuntimeError("Failed to send email after multiple attempts")
+                results.append(RuntimeError("Failed to send email"))
+    finally:
+        await smtp_cp.release(conn)
+    return results
 
 
-def _send_to_connection(conn: SMTPConnection, to: str, subject: str, context: str):
+async def _send_to_connection(conn: SMTPConnection, to: str, message: bytes):
     try:
-        conn.send(to, subject, context)
+        await conn.send_raw(to, message)
         return True
     except Exception as e:
         logger.info("Failed to send email via SMTP: %s", e)
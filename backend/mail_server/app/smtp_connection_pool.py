@@ -1,14 +1,24 @@
 import time
-import smtplib
-import queue
+import asyncio
 import logging
+import aiosmtplib
+from collections import deque
 from email.mime.text import MIMEText
-from prometheus_client import Histogram
+from prometheus_client import Gauge, Histogram
 
 logger = logging.getLogger(__name__)
 EMAIL_SEND_DURATION = Histogram(
     "email_send_duration_seconds", "Time spent sending an email"
 )
+SMTP_ACQUIRE_WAIT = Histogram(
+    "smtp_pool_acquire_wait_seconds", "Time spent waiting for a pooled SMTP connection"
+)
+SMTP_POOL_SIZE = Gauge("smtp_pool_size", "Open SMTP connections, idle or in use")
+SMTP_POOL_IDLE = Gauge("smtp_pool_idle", "Idle SMTP connections in the pool")
+SMTP_POOL_READY = Gauge("smtp_pool_ready", "1 once the pool reached ready_size")
+SMTP_POOL_STARTUP = Gauge(
+    "smtp_pool_startup_seconds", "Time from pool start until it became ready"
+)
 
 
 class SMTPConnectionError(Exception):
@@ -16,101 +26,333 @@ class SMTPConnectionError(Exception):
 
 
 class SMTPConfig:
-    def __init__(self, host, port, user, password):
+    def __init__(self, host, port, user, password, timeout=10, use_tls=True):
         self.host = host
         self.port = port
         self.user = user
         self.password = password
+        self.timeout = timeout
+        self.use_tls = use_tls
 
 
 class SMTPConnection:
     def __init__(self, config: SMTPConfig):
         self.config = config
         self.connection = None
-        self.connect()
+        self.created_at = time.time()
+        self.last_used_at = self.created_at
 
-    def validate(self):
-        if self.connection is None:
+    @property
+    def is_connected(self):
+        return self.connection is not None and self.connection.is_connected
+
+    async def validate(self):
+        if not self.is_connected:
             raise SMTPConnectionError("No SMTP connection established")
         try:
-            self.connection.noop()
+            await self.connection.noop()
         except Exception:
             raise SMTPConnectionError("SMTP connection is not valid")
 
-    def connect(self):
+    async def connect(self):
+        await self.quit()
         try:
-            self.validate()
-        except SMTPConnectionError:
-            if self.connection:
-                self.quit()
-            self.connection = smtplib.SMTP_SSL(self.config.host, self.config.port)
-            self.connection.login(self.config.user, self.config.password)
+            connection = aiosmtplib.SMTP(
+                hostname=self.config.host,
+                port=self.config.port,
+                use_tls=self.config.use_tls,
+                timeout=self.config.timeout,
+            )
+            await connection.connect()
+            await connection.login(self.config.user, self.config.password)
+            self.connection = connection
+            self.created_at = time.time()
+            self.last_used_at = self.created_at
         except Exception as e:
-            logger.info("Failed to connect to SMTP server")
-            raise SMTPConnectionError("Failed to connect to SMTP server")
+            logger.info("Failed to connect to SMTP server: %s", e)
+            raise SMTPConnectionError("Failed to connect to SMTP server") from e
 
-    def send(self, to_addr, subject, msg):
+    async def send(self, to_addr, subject, msg):
+        if not self.is_connected:
+            raise SMTPConnectionError("No SMTP connection established")
         msg = MIMEText(msg)
         msg["Subject"] = subject
         msg["From"] = self.config.user
         msg["To"] = to_addr
+        await self.send_raw(to_addr, msg.as_bytes())
+
+    async def send_raw(self, to_addr, data: bytes):
+        """Sends an already rendered message (headers included)."""
+        if not self.is_connected:
+            raise SMTPConnectionError("No SMTP connection established")
         start_time = time.time()
         try:
-            self.connection.sendmail(self.config.user, to_addr, msg.as_string())
+            await self.connection.sendmail(self.config.user, [to_addr], data)
         except Exception as e:
             raise SMTPConnectionError("Failed to send email") from e
         finally:
             duration = time.time() - start_time
             EMAIL_SEND_DURATION.observe(duration)
 
-    def quit(self):
+    async def quit(self):
         if self.connection:
             try:
-                self.connection.quit()
+                await self.connection.quit()
             except Exception:
-                pass
+                self.connection.close()
             self.connection = None
 
 
 class SMTPConnectionPool:
-    def __init__(self, config: SMTPConfig, pool_size=5):
-        self.config = SMTPConfig
-        self.pool_size = pool_size
+    """
+    Elastic pool of authenticated SMTP connections.
+    Grows on demand up to max_size and keeps at least min_size connections.
+    Warm-up opens connections concurrently; initialize() returns as soon as
+    ready_size of them are up and the rest are filled in the background.
+    Liveness is checked by a background task on idle connections only; idle
+    connections above min_size are closed after idle_timeout and every
+    connection is recycled once it is older than max_age.
+    """
+
+    def __init__(
+        self,
+        config: SMTPConfig,
+        min_size=1,
+        max_size=5,
+        acquire_timeout=10,
+        idle_timeout=300,
+        max_age=1800,
+        health_check_interval=60,
+        ready_size=1,
+    ):
         self.config = config
+        self.min_size = min(min_size, max_size)
+        self.max_size = max_size
+        self.ready_size = min(ready_size, max_size)
+        self.acquire_timeout = acquire_timeout
+        self.idle_timeout = idle_timeout
+        self.max_age = max_age
+        self.health_check_interval = health_check_interval
+
+        self._idle = deque()
+        self._size = 0
+        self._connecting = 0
+        self._cond = asyncio.Condition()
+        self._maintenance = None
+        self._warmup = []
+        self._ready = asyncio.Event()
+        self.startup_seconds = None
+        self._started_at = None
 
-        self._pool = queue.Queue(maxsize=pool_size)
-        self._initialize_pool()
+    @property
+    def pool_size(self):
+        return self.max_size
 
-    def _create_connection(self):
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def _mark_ready(self):
+        if self._ready.is_set() or self._size - self._connecting < self.ready_size:
+            return
+        self.startup_seconds = time.monotonic() - self._started_at
+        SMTP_POOL_STARTUP.set(self.startup_seconds)
+        SMTP_POOL_READY.set(1)
+        self._ready.set()
+
+    def _expired(self, conn: SMTPConnection, now):
+        return now - conn.created_at > self.max_age
+
+    def _report(self):
+        SMTP_POOL_SIZE.set(self._size)
+        SMTP_POOL_IDLE.set(len(self._idle))
+
+    async def _create_connection(self):
         logger.info("create new SMTP connection")
         connection = SMTPConnection(self.config)
+        self._connecting += 1
         try:
-            connection.connect()
+            await connection.connect()
+        finally:
+            self._connecting -= 1
+        return connection
+
+    async def _discard(self, conn: SMTPConnection):
+        async with self._cond:
+            self._size -= 1
+            self._report()
+            self._cond.notify()
+        await conn.quit()
+
+    async def initialize(self):
+        self._started_at = time.monotonic()
+        SMTP_POOL_READY.set(0)
+        self._warmup = [
+            asyncio.create_task(self._add_idle())
+            for _ in range(max(self.min_size, self.ready_size))
+        ]
+        self._mark_ready()
+        if not self.ready:
+            # Wait for ready_size connections, or until every attempt finished.
+            for attempt in asyncio.as_completed(self._warmup):
+                await attempt
+                if self.ready:
+                    break
+        self._warmup = [task for task in self._warmup if not task.done()]
+        if self._warmup:
+            asyncio.create_task(self._log_warmup(self._warmup))
+        self._maintenance = asyncio.create_task(self._maintain())
+
+    async def _log_warmup(self, tasks):
+        await asyncio.gather(*tasks, return_exceptions=True)
+        logger.info(
+            "SMTP pool warm-up finished with %d connections in %.2fs",
+            self._size,
+            time.monotonic() - self._started_at,
+        )
+
+    async def _add_idle(self):
+        async with self._cond:
+            if self._size >= self.max_size:
+                return False
+            self._size += 1
+            self._report()
+        try:
+            conn = await self._create_connection()
         except SMTPConnectionError as e:
             logger.info(e)
+            async with self._cond:
+                self._size -= 1
+                self._report()
+                self._cond.notify()
+            return False
+        async with self._cond:
+            self._idle.append(conn)
+            self._report()
+            self._mark_ready()
+            self._cond.notify()
+        return True
+
+    async def _fill_to_min(self):
+        missing = self.min_size - self._size
+        if missing > 0:
+            await asyncio.gather(*(self._add_idle() for _ in range(missing)))
+
+    async def acquire(self) -> SMTPConnection:
+        start_time = time.time()
+        deadline = time.monotonic() + self.acquire_timeout
+        try:
+            async with self._cond:
+                while True:
+                    while self._idle:
+                        conn = self._idle.pop()
+                        if self._expired(conn, time.time()) or not conn.is_connected:
+                            # Recycled in place of an idle slot; quit off-path.
+                            self._size -= 1
+                            asyncio.create_task(conn.quit())
+                            continue
+                        self._report()
+                        return conn
+                    if self._size < self.max_size:
+                        self._size += 1
+                        self._report()
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise SMTPConnectionError(
+                            "Timed out waiting for an SMTP connection"
+                        )
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        raise SMTPConnectionError(
+                            "Timed out waiting for an SMTP connection"
+                        )
+            try:
+                conn = await self._create_connection()
+                self._mark_ready()
+                return conn
+            except SMTPConnectionError:
+                async with self._cond:
+                    self._size -= 1
+                    self._report()
+                    self._cond.notify()
+                raise
         finally:
-            return connection
+            SMTP_ACQUIRE_WAIT.observe(time.time() - start_time)
 
-    def _initialize_pool(self):
-        for _ in range(self.pool_size):
-            conn = self._create_connection()
-            self._pool.put(conn)
+    async def release(self, conn: SMTPConnection):
+        now = time.time()
+        if not conn.is_connected or self._expired(conn, now):
+            await self._discard(conn)
+            return
+        conn.last_used_at = now
+        async with self._cond:
+            self._idle.append(conn)
+            self._report()
+            self._cond.notify()
 
-    def acquire(self) -> SMTPConnection:
-        return self._pool.get()
+    async def _maintain(self):
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            try:
+                await self._check_idle()
+                await self._fill_to_min()
+            except Exception as e:
+                logger.info("SMTP pool maintenance failed: %s", e)
 
-    def release(self, conn: SMTPConnection):
-        try:
-            conn.validate()
-        except SMTPConnectionError:
-            logger.info("reconnecte SMTP connection")
+    async def _check_idle(self):
+        # Connections used within the last interval are known to be alive;
+        # only the ones that sat idle for a whole interval are taken out and
+        # probed, so acquirers keep getting the warm ones meanwhile.
+        now = time.time()
+        async with self._cond:
+            stale = [
+                conn
+                for conn in self._idle
+                if now - conn.last_used_at >= self.health_check_interval
+            ]
+            for conn in stale:
+                self._idle.remove(conn)
+            self._report()
+
+        async def check(conn: SMTPConnection):
+            evictable = self._size > self.min_size
+            if self._expired(conn, now) or (
+                evictable and now - conn.last_used_at > self.idle_timeout
+            ):
+                await self._discard(conn)
+                return None
             try:
-                conn.connect()
-            except SMTPConnectionError as e:
-                logger.info(e)
-        self._pool.put(conn)
-
-    def quit(self):
-        while not self._pool.empty():
-            conn = self._pool.get()
-            conn.quit()
+                await conn.validate()
+            except SMTPConnectionError:
+                logger.info("drop dead idle SMTP connection")
+                await self._discard(conn)
+                return None
+            return conn
+
+        keep = [conn for conn in await asyncio.gather(*map(check, stale)) if conn]
+        async with self._cond:
+            self._idle.extendleft(reversed(keep))
+            self._report()
+            self._cond.notify(len(keep))
+
+    async def quit(self):
+        if self._maintenance is not None:
+            self._maintenance.cancel()
+            self._maintenance = None
+        for task in self._warmup:
+            task.cancel()
+        await asyncio.gather(*self._warmup, return_exceptions=True)
+        self._warmup = []
+        async with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._report()
+        for conn in idle:
+            await conn.quit()
@@ -0,0 +1,233 @@
+import re
+import html
+import uuid
+from email.header import Header, decode_header, make_header
+from email.message import EmailMessage
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+DEFAULT_FORMAT = "DEFAULT"
+DIGEST_FORMAT = "DIGEST"
+
+# Positional ({0}, {1}, ...) and named ({format}, {recipient}, {parameters},
+# {count}) placeholders.
+PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+
+class TemplateSource(NamedTuple):
+    subject: str
+    text: str
+    html: str
+
+
+TEMPLATES: Dict[str, TemplateSource] = {
+    "SIGNUP_AUTH": TemplateSource(
+        subject="회원가입 인증 코드",
+        text="회원가입 인증 코드는 {0} 입니다.\n{1}분 안에 입력해 주세요.\n",
+        html=(
+            "<p>회원가입 인증 코드는 <strong>{0}</strong> 입니다.</p>"
+            "<p>{1}분 안에 입력해 주세요.</p>"
+        ),
+    ),
+    "2FA_AUTH": TemplateSource(
+        subject="로그인 인증 코드",
+        text="로그인 인증 코드는 {0} 입니다.\n{1}분 안에 입력해 주세요.\n",
+        html=(
+            "<p>로그인 인증 코드는 <strong>{0}</strong> 입니다.</p>"
+            "<p>{1}분 안에 입력해 주세요.</p>"
+        ),
+    ),
+    DEFAULT_FORMAT: TemplateSource(
+        subject="[{format}] {recipient}",
+        text="{parameters}\n",
+        html="<pre>{parameters}</pre>",
+    ),
+    # Only the subject is used; the body is the rendered items, in order.
+    DIGEST_FORMAT: TemplateSource(
+        subject="[DIGEST] {recipient} ({count})",
+        text="",
+        html="",
+    ),
+}
+
+
+class CompiledText:
+    """
+    Template text split once into pre-encoded static chunks and placeholder
+    names, so rendering only encodes the substituted values.
+    """
+
+    def __init__(self, source: str, escape=None, crlf=True):
+        if crlf:
+            source = source.replace("\r\n", "\n").replace("\n", "\r\n")
+        self.escape = escape
+        self.crlf = crlf
+        self.parts: List = []
+        position = 0
+        for match in PLACEHOLDER.finditer(source):
+            if match.start() > position:
+                self.parts.append(source[position : match.start()].encode("utf-8"))
+            name = match.group(1)
+            self.parts.append(int(name) if name.isdigit() else name)
+            position = match.end()
+        if position < len(source):
+            self.parts.append(source[position:].encode("utf-8"))
+        self.static = all(isinstance(part, bytes) for part in self.parts)
+
+    def render(self, values: dict, parameters: Sequence) -> bytes:
+        if self.static:
+            return b"".join(self.parts)
+        out = []
+        for part in self.parts:
+            if isinstance(part, bytes):
+                out.append(part)
+                continue
+            if isinstance(part, int):
+                value = str(parameters[part]) if part < len(parameters) else ""
+            else:
+                value = str(values.get(part, ""))
+            if self.escape is not None:
+                value = self.escape(value)
+            if self.crlf:
+                value = value.replace("\r\n", "\n").replace("\n", "\r\n")
+            out.append(value.encode("utf-8"))
+        return b"".join(out)
+
+    def render_str(self, values: dict, parameters: Sequence) -> str:
+        return self.render(values, parameters).decode("utf-8")
+
+
+def _encode_subject(subject: str) -> bytes:
+    if subject.isascii():
+        return subject.encode("ascii")
+    return Header(subject, "utf-8").encode().encode("ascii")
+
+
+class MailTemplate:
+    """
+    One compiled format. Header lines that do not depend on the message
+    (From, MIME headers, part headers, static subjects) are encoded once.
+    """
+
+    def __init__(self, format: str, source: TemplateSource, sender: str, boundary):
+        self.format = format
+        self.source = source
+        self.sender = sender
+        self.boundary = boundary
+        self.subject = CompiledText(source.subject, crlf=False)
+        self.text = CompiledText(source.text)
+        self.html = CompiledText(source.html, escape=html.escape)
+        self._subject_line = (
+            b"Subject: " + _encode_subject(self.subject.render_str({}, ())) + b"\r\n"
+            if self.subject.static
+            else None
+        )
+        marker = b"--" + boundary
+        self._head = (
+            b"From: " + sender.encode("utf-8") + b"\r\n"
+            b"MIME-Version: 1.0\r\n"
+            b'Content-Type: multipart/alternative; boundary="' + boundary + b'"\r\n'
+        )
+        self._text_head = (
+            b"\r\n" + marker + b"\r\n"
+            b'Content-Type: text/plain; charset="utf-8"\r\n'
+            b"Content-Transfer-Encoding: 8bit\r\n\r\n"
+        )
+        self._html_head = (
+            b"\r\n" + marker + b"\r\n"
+            b'Content-Type: text/html; charset="utf-8"\r\n'
+            b"Content-Transfer-Encoding: 8bit\r\n\r\n"
+        )
+        self._tail = b"\r\n" + marker + b"--\r\n"
+
+    def subject_line(self, values: dict, parameters: Sequence) -> bytes:
+        if self._subject_line is not None:
+            return self._subject_line
+        subject = self.subject.render_str(values, parameters)
+        subject = " ".join(subject.splitlines())
+        return b"Subject: " + _encode_subject(subject) + b"\r\n"
+
+    def assemble(self, to: str, subject_line: bytes, text: bytes, body: bytes):
+        if self.boundary in text or self.boundary in body:
+            return self._fallback(to, subject_line, text, body)
+        return b"".join(
+            (
+                self._head,
+                b"To: " + to.encode("utf-8") + b"\r\n",
+                subject_line,
+                self._text_head,
+                text,
+                self._html_head,
+                body,
+                self._tail,
+            )
+        )
+
+    def _fallback(self, to: str, subject_line: bytes, text: bytes, body: bytes):
+        # Substituted values contained the boundary; let the email package
+        # pick a safe one.
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = to
+        encoded = subject_line[len(b"Subject: ") : -2].decode("ascii")
+        message["Subject"] = str(make_header(decode_header(encoded)))
+        message.set_content(text.decode("utf-8"))
+        message.add_alternative(body.decode("utf-8"), subtype="html")
+        return message.as_bytes()
+
+
+class TemplateRegistry:
+    """
+    Mail templates keyed by EmailRequest.format, compiled once at startup.
+    Formats without their own template use DEFAULT_FORMAT.
+    """
+
+    def __init__(
+        self, sender: str, sources: Optional[Dict[str, TemplateSource]] = None
+    ):
+        self.sender = sender
+        self.boundary = ("=_" + uuid.uuid4().hex).encode("ascii")
+        self.templates = {
+            format: MailTemplate(format, source, sender, self.boundary)
+            for format, source in (sources or TEMPLATES).items()
+        }
+        self.default = self.templates[DEFAULT_FORMAT]
+        self.digest = self.templates[DIGEST_FORMAT]
+
+    def get(self, format: str) -> MailTemplate:
+        return self.templates.get(format, self.default)
+
+    def render(self, to: str, format: str, recipient: str, parameters: Sequence):
+        template = self.get(format)
+        values = {"format": format, "recipient": recipient, "parameters": parameters}
+        return template.assemble(
+            to,
+            template.subject_line(values, parameters),
+            template.text.render(values, parameters),
+            template.html.render(values, parameters),
+        )
+
+    def render_digest(self, to: str, recipient: str, items: Sequence):
+        """items are (format, parameters) pairs merged into one mail."""
+        texts, bodies = [], []
+        for format, parameters in items:
+            template = self.get(format)
+            values = {
+                "format": format,
+                "recipient": recipient,
+                "parameters": parameters,
+            }
+            subject = template.subject.render(values, parameters)
+            texts.append(subject + b"\r\n" + template.text.render(values, parameters))
+            bodies.append(
+                b"<h4>"
+                + html.escape(subject.decode("utf-8")).encode("utf-8")
+                + b"</h4>"
+                + template.html.render(values, parameters)
+            )
+        values = {"recipient": recipient, "count": len(items)}
+        return self.digest.assemble(
+            to,
+            self.digest.subject_line(values, ()),
+            b"\r\n".join(texts),
+            b"<hr>".join(bodies),
+        )
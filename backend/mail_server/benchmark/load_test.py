@@ -0,0 +1,340 @@
+"""
+Load-test harness for mail_server against a local SMTP sink.
+
+Starts an aiosmtpd sink that can inject latency, temporary failures and
+dropped connections, points SMTPConfig at it through SMTP_HOST/SMTP_PORT/
+SMTP_USE_TLS, and runs the app in-process. uid lookups for /email/status are
+answered by a stub user server. Requires the mail_server requirements plus
+aiosmtpd; no real mailbox is contacted.
+
+    python backend/mail_server/benchmark/load_test.py --requests 2000 \\
+        --concurrency 64 --fail-rate 0.05 --drop-rate 0.01 --output load.json
+
+The report covers HTTP accept latency, end-to-end delivery latency
+(enqueue -> sink accepted), delivery throughput, retry counts (outbox
+re-attempts and resends on the same SMTP connection) and SMTP pool acquire /
+lane slot waits.
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+
+
+class FaultySink:
+    """aiosmtpd handler with injected latency, 451 failures and dropped sessions."""
+
+    def __init__(self, latency, jitter, fail_rate, drop_rate, seed):
+        self.latency = latency
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self.drop_rate = drop_rate
+        self.random = random.Random(seed)
+        self.accepted = 0
+        self.failed = 0
+        self.dropped = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        roll = self.random.random()
+        if roll < self.drop_rate:
+            self.dropped += 1
+            server.transport.close()
+            return "421 Connection dropped"
+        if roll < self.drop_rate + self.fail_rate:
+            self.failed += 1
+            return "451 Temporary failure"
+        self.accepted += 1
+        return "250 OK"
+
+
+def start_sink(args):
+    from aiosmtpd.controller import Controller
+    from aiosmtpd.smtp import AuthResult
+
+    def authenticate(server, session, envelope, mechanism, auth_data):
+        return AuthResult(success=True)
+
+    handler = FaultySink(
+        args.latency, args.jitter, args.fail_rate, args.drop_rate, args.seed
+    )
+    controller = Controller(
+        handler,
+        hostname="127.0.0.1",
+        port=args.smtp_port,
+        authenticator=authenticate,
+        auth_require_tls=False,
+    )
+    controller.start()
+    return controller, handler
+
+
+def _configure_env(args, outbox_path):
+    os.environ.setdefault("GMAIL_USER", "load-test@example.com")
+    os.environ.setdefault("GMAIL_PASSWORD", "load-test")
+    os.environ["SMTP_HOST"] = "127.0.0.1"
+    os.environ["SMTP_PORT"] = str(args.smtp_port)
+    os.environ["SMTP_USE_TLS"] = "false"
+    os.environ["SMTP_POOL_MIN_SIZE"] = str(args.pool_min)
+    os.environ["SMTP_POOL_MAX_SIZE"] = str(args.pool_max)
+    os.environ["OUTBOX_PATH"] = outbox_path
+    os.environ["OUTBOX_RETRY_BASE_DELAY"] = str(args.retry_base_delay)
+    os.environ["OUTBOX_RETRY_MAX_DELAY"] = str(args.retry_base_delay * 16)
+    sys.path.insert(0, str(APP_DIR))
+
+
+def _percentiles(samples):
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": pick(0.50) * 1000,
+        "p99_ms": pick(0.99) * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def _histogram(name, labels=None):
+    """Mean and bucket-estimated p50/p99 of a prometheus histogram, in ms."""
+    from prometheus_client import REGISTRY
+
+    labels = labels or {}
+    count = REGISTRY.get_sample_value(f"{name}_count", labels) or 0.0
+    total = REGISTRY.get_sample_value(f"{name}_sum", labels) or 0.0
+    buckets = []
+    for metric in REGISTRY.collect():
+        for sample in metric.samples:
+            if sample.name != f"{name}_bucket":
+                continue
+            if any(sample.labels.get(k) != v for k, v in labels.items()):
+                continue
+            buckets.append((float(sample.labels["le"]), sample.value))
+    buckets.sort()
+
+    def quantile(q):
+        for bound, cumulative in buckets:
+            if count and cumulative >= q * count:
+                return bound * 1000
+        return None
+
+    return {
+        "count": int(count),
+        "mean_ms": total / count * 1000 if count else None,
+        "p50_le_ms": quantile(0.50),
+        "p99_le_ms": quantile(0.99),
+    }
+
+
+def _counter(name, labels):
+    from prometheus_client import REGISTRY
+
+    return REGISTRY.get_sample_value(f"{name}_total", labels) or 0.0
+
+
+async def drive(client, path, make_body, requests, concurrency):
+    samples, message_ids, errors = [], [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(path, json=make_body(i))
+            samples.append(time.perf_counter() - start)
+            if response.status_code == 202:
+                message_ids.append(response.json()["message_id"])
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    result = _percentiles(samples)
+    result["requests_per_sec"] = requests / elapsed
+    result["errors"] = errors
+    return result, message_ids
+
+
+async def wait_delivered(outbox, message_ids, timeout):
+    deadline = time.monotonic() + timeout
+    pending = set(message_ids)
+    messages = {}
+    while pending and time.monotonic() < deadline:
+        for message_id in list(pending):
+            message = await outbox.get(message_id)
+            if message.status in ("sent", "dead"):
+                messages[message_id] = message
+                pending.discard(message_id)
+        if pending:
+            await asyncio.sleep(0.2)
+    return messages, pending
+
+
+async def run(args):
+    import httpx
+    import main as mail_server
+
+    def user_server(request):
+        if request.url.path == "/users/emails/":
+            uids = json.loads(request.content)["uids"]
+            return httpx.Response(
+                200,
+                json={
+                    "emails": {uid: f"{uid}@example.com" for uid in uids},
+                    "missing": [],
+                },
+            )
+        uid = request.url.params.get("uid", "")
+        return httpx.Response(200, json={"email": f"{uid}@example.com"})
+
+    app = mail_server.app
+    async with app.router.lifespan_context(app):
+        # Swap the lifespan's user server client for the stub; the lifespan
+        # only closes whichever client is installed at shutdown.
+        await mail_server.http_client.aclose()
+        mail_server.http_client = httpx.AsyncClient(
+            base_url="http://user-server", transport=httpx.MockTransport(user_server)
+        )
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://load", timeout=60
+        ) as client:
+            start = time.perf_counter()
+            users, user_ids = await drive(
+                client,
+                "/email/users",
+                lambda i: {
+                    "to": f"user{i}@example.com",
+                    "format": "SIGNUP_AUTH" if i % 2 else "2FA_AUTH",
+                    "parameters": [f"{i % 100000:05d}", "5"],
+                },
+                args.requests,
+                args.concurrency,
+            )
+            status, status_ids = await drive(
+                client,
+                "/email/status",
+                lambda i: {
+                    "to": f"uid-{i % args.status_users}",
+                    "format": "STATUS",
+                    "parameters": [f"blackbox-{i}", "IMPACT"],
+                },
+                args.status_requests,
+                args.concurrency,
+            )
+            messages, unfinished = await wait_delivered(
+                mail_server.outbox, user_ids + status_ids, args.drain_timeout
+            )
+            elapsed = time.perf_counter() - start
+
+    delivered = [m for m in messages.values() if m.status == "sent"]
+    lanes = {}
+    for lane in ("interactive", "bulk"):
+        lane_messages = [m for m in delivered if m.lane == lane]
+        lanes[lane] = {
+            "end_to_end": _percentiles(
+                [m.updated_at - m.created_at for m in lane_messages]
+            ),
+            "slot_wait": _histogram("mail_lane_slot_wait_seconds", {"lane": lane}),
+        }
+    return {
+        "http": {"users": users, "status": status},
+        "delivery": {
+            "sent": len(delivered),
+            "dead": sum(1 for m in messages.values() if m.status == "dead"),
+            "unfinished": len(unfinished),
+            "elapsed_seconds": elapsed,
+            "messages_per_sec": len(delivered) / elapsed,
+            "lanes": lanes,
+        },
+        "retries": {
+            "retried_messages": sum(1 for m in messages.values() if m.attempts > 1),
+            "extra_attempts": sum(m.attempts - 1 for m in messages.values()),
+            "retry_outcomes": _counter("outbox_deliveries", {"outcome": "retry"}),
+            "in_connection_retries": _counter("email_send_retries", {}),
+        },
+        "pool": {
+            "acquire_wait": _histogram("smtp_pool_acquire_wait_seconds"),
+            "send": _histogram("email_send_duration_seconds"),
+        },
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=APP_DIR, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="mail_server load test")
+    parser.add_argument("--output", default="mail_load_test.json")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--status-requests", type=int, default=500)
+    parser.add_argument("--status-users", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--pool-min", type=int, default=1)
+    parser.add_argument("--pool-max", type=int, default=5)
+    parser.add_argument("--smtp-port", type=int, default=8025)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--retry-base-delay", type=float, default=0.2)
+    parser.add_argument("--drain-timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _configure_env(args, os.path.join(tmp, "outbox.sqlite3"))
+        controller, sink = start_sink(args)
+        try:
+            results = asyncio.run(run(args))
+        finally:
+            controller.stop()
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "sink": {
+            "accepted": sink.accepted,
+            "failed": sink.failed,
+            "dropped": sink.dropped,
+        },
+        **results,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Offline mail rendering benchmark for mail_server.
+
+Compares the per-message cost of the template registry against the previous
+MIMEText path (f-string subject, str(parameters) body, as_string()). Needs only
+the mail_server app modules; no SMTP server is contacted.
+
+    python backend/mail_server/benchmark/render_benchmark.py --output bench.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from email.mime.text import MIMEText
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+sys.path.insert(0, str(APP_DIR))
+
+from templates import TemplateRegistry  # noqa: E402
+
+SENDER = "bench@example.com"
+CASES = {
+    "SIGNUP_AUTH": ("user@example.com", "user@example.com", ["12345", "5"]),
+    "2FA_AUTH": ("user@example.com", "user@example.com", ["54321", "5"]),
+    "STATUS": (
+        "user@example.com",
+        "0f8fad5b-d9cb-469f-a165-70867728950e",
+        ["blackbox-01", "IMPACT", "2024-05-01T12:00:00"],
+    ),
+}
+
+
+def legacy_render(to, format, recipient, parameters):
+    msg = MIMEText(str(parameters))
+    msg["Subject"] = f"[{format}] {recipient}"
+    msg["From"] = SENDER
+    msg["To"] = to
+    return msg.as_string().encode("utf-8")
+
+
+def _percentiles(samples):
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    return {
+        "count": len(ordered),
+        "mean_us": statistics.fmean(ordered) * 1e6,
+        "p50_us": pick(0.50) * 1e6,
+        "p99_us": pick(0.99) * 1e6,
+        "messages_per_sec": len(ordered) / sum(ordered),
+    }
+
+
+def _allocation(render, samples):
+    """Average peak traced allocation (bytes) of one render call."""
+    tracemalloc.start()
+    try:
+        peaks = []
+        for _ in range(samples):
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+            render()
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - baseline)
+    finally:
+        tracemalloc.stop()
+    return {"peak_bytes_mean": statistics.fmean(peaks), "peak_bytes_max": max(peaks)}
+
+
+def bench(render, iterations, alloc_samples):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        render()
+        samples.append(time.perf_counter() - start)
+    result = _percentiles(samples)
+    result.update(_allocation(render, alloc_samples))
+    result["message_bytes"] = len(render())
+    return result
+
+
+def run(iterations, alloc_samples, digest_size):
+    registry = TemplateRegistry(SENDER)
+    results = {}
+    for format, (to, recipient, parameters) in CASES.items():
+        results[format] = {
+            "legacy": bench(
+                lambda: legacy_render(to, format, recipient, parameters),
+                iterations,
+                alloc_samples,
+            ),
+            "registry": bench(
+                lambda: registry.render(to, format, recipient, parameters),
+                iterations,
+                alloc_samples,
+            ),
+        }
+    to, recipient, parameters = CASES["STATUS"]
+    items = [("STATUS", parameters)] * digest_size
+    results["DIGEST"] = {
+        "items": digest_size,
+        "registry": bench(
+            lambda: registry.render_digest(to, recipient, items),
+            iterations,
+            alloc_samples,
+        ),
+    }
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=APP_DIR, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="mail_server rendering benchmark")
+    parser.add_argument("--output", default="mail_render_benchmark.json")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--alloc-samples", type=int, default=500)
+    parser.add_argument("--digest-size", type=int, default=10)
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "render": run(args.iterations, args.alloc_samples, args.digest_size),
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    from outbox import Outbox
+
+    box = Outbox(str(tmp_path / "outbox.sqlite3"))
+    yield box
+    box.close()
@@ -0,0 +1,40 @@
+import asyncio
+import time
+
+from outbox import DEAD, SENT
+
+
+def test_auth_codes_are_cleared_once_final(outbox):
+    signup = outbox._enqueue("mail", "a@example.com", "SIGNUP_AUTH", ["123456"], "i")
+    second = outbox._enqueue("mail", "b@example.com", "2FA_AUTH", ["654321"], "i")
+    notice = outbox._enqueue("mail", "c@example.com", "NOTICE", ["hello"], "bulk")
+    retried = outbox._enqueue("mail", "d@example.com", "2FA_AUTH", ["111111"], "i")
+
+    async def finish():
+        await outbox.mark_sent(signup)
+        await outbox.mark_dead(second, "rejected")
+        await outbox.mark_sent(notice)
+        await outbox.mark_retry(retried, time.time(), "timeout")
+
+    asyncio.run(finish())
+    assert outbox._get(signup).parameters == []
+    assert outbox._get(second).parameters == []
+    assert outbox._get(second).status == DEAD
+    assert outbox._get(notice).parameters == ["hello"]
+    assert outbox._get(retried).parameters == ["111111"]
+
+
+def test_purge_keeps_dead_rows_for_their_own_window(outbox):
+    sent = outbox._enqueue("mail", "a@example.com", "NOTICE", [], "bulk")
+    dead = outbox._enqueue("mail", "b@example.com", "NOTICE", [], "bulk")
+    outbox._update(sent, SENT)
+    outbox._update(dead, DEAD, error="rejected")
+    later = time.time() + 1
+
+    assert outbox._purge(later) == 1
+    assert outbox._get(sent) is None
+    assert outbox._get(dead) is not None
+
+    assert outbox._purge(later, dead_older_than=later - 3600) == 0
+    assert outbox._purge(later, dead_older_than=later) == 1
+    assert outbox._get(dead) is None
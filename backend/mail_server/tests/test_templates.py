@@ -0,0 +1,18 @@
+from email import message_from_bytes, policy
+
+from templates import TemplateRegistry
+
+
+def bodies(raw):
+    message = message_from_bytes(raw, policy=policy.default)
+    return [part.get_content() for part in message.walk() if not part.is_multipart()]
+
+
+def test_auth_templates_state_the_lifetime_they_are_given():
+    registry = TemplateRegistry("noreply@example.com")
+    for format in ("SIGNUP_AUTH", "2FA_AUTH"):
+        raw = registry.render("a@example.com", format, "a@example.com", ["12345", "3"])
+        for body in bodies(raw):
+            assert "12345" in body
+            assert "3분 안에 입력해 주세요" in body
+            assert "5분" not in body
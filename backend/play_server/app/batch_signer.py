@@ -0,0 +1,81 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import chain
+from typing import Callable, List, Optional, Sequence, TypeVar
+
+T = TypeVar("T")
+
+
+class BatchSigner:
+    """!
+    @brief Spreads large signing batches across a thread or process pool
+    @details Keys are split into chunks of chunk_size and handed to sign_chunk on
+             the pool; results are flattened back in input order. Batches no larger
+             than parallel_threshold are signed inline on the calling thread.
+             sign_chunk must be a module-level function when pool_kind is "process";
+             process workers are started with spawn, so they never inherit the
+             threads or state of the app process.
+    """
+
+    def __init__(
+        self,
+        sign_chunk: Callable[..., List[T]],
+        pool_kind: str = "thread",
+        max_workers: Optional[int] = None,
+        chunk_size: int = 32,
+        parallel_threshold: int = 16,
+    ):
+        if pool_kind not in ("thread", "process"):
+            raise ValueError(f"Unknown signing pool kind: {pool_kind}")
+        self.sign_chunk = sign_chunk
+        self.pool_kind = pool_kind
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.chunk_size = max(1, chunk_size)
+        self.parallel_threshold = parallel_threshold
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.pool_kind == "process":
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix="batch-signer",
+                    )
+            return self._executor
+
+    def _chunks(self, items: Sequence[str]) -> List[Sequence[str]]:
+        return [
+            items[i : i + self.chunk_size]
+            for i in range(0, len(items), self.chunk_size)
+        ]
+
+    def sign(self, items: Sequence[str], *args) -> List[T]:
+        """!
+        @brief Sign every item, preserving input order
+        @param items URLs (or keys) handed to sign_chunk
+        @param args extra positional arguments forwarded to sign_chunk
+        @return one result per item, in the same order as items
+        """
+        items = list(items)
+        if self.max_workers <= 1 or len(items) <= self.parallel_threshold:
+            return self.sign_chunk(items, *args)
+
+        chunks = self._chunks(items)
+        executor = self._get_executor()
+        futures = [executor.submit(self.sign_chunk, chunk, *args) for chunk in chunks]
+        return list(chain.from_iterable(future.result() for future in futures))
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
@@ -0,0 +1,74 @@
+import base64
+import datetime
+from typing import NamedTuple, Optional
+from botocore.signers import CloudFrontSigner
+
+
+class SignedPolicy(NamedTuple):
+    """!
+    @brief CloudFront custom policy with its signature, both CloudFront-base64 encoded
+    """
+
+    policy: str
+    signature: str
+    key_pair_id: str
+    expire_time: datetime.datetime
+
+    @property
+    def query_string(self) -> str:
+        return (
+            f"Policy={self.policy}&Signature={self.signature}"
+            f"&Key-Pair-Id={self.key_pair_id}"
+        )
+
+
+def url_b64encode(data: bytes) -> str:
+    """!
+    @brief Base64 variant required by CloudFront for policies and signatures
+    @param data raw bytes
+    @return encoded string
+    """
+    return (
+        base64.b64encode(data)
+        .replace(b"+", b"-")
+        .replace(b"=", b"_")
+        .replace(b"/", b"~")
+        .decode("ascii")
+    )
+
+
+def sign_custom_policy(
+    signer: CloudFrontSigner,
+    resource: str,
+    expire_time: datetime.datetime,
+    date_greater_than: Optional[datetime.datetime] = None,
+) -> SignedPolicy:
+    """!
+    @brief Build and sign a custom policy; resource may contain a trailing wildcard
+    @param signer CloudFront signer holding the key pair id and RSA signer
+    @param resource URL or URL pattern (e.g. https://cdn/blackbox-uuid/*)
+    @param expire_time policy DateLessThan
+    @param date_greater_than optional policy DateGreaterThan
+    @return SignedPolicy shared by every object the resource pattern matches
+    """
+    policy = signer.build_policy(
+        resource, expire_time, date_greater_than=date_greater_than
+    ).encode("utf8")
+    signature = signer.rsa_signer(policy)
+    return SignedPolicy(
+        policy=url_b64encode(policy),
+        signature=url_b64encode(signature),
+        key_pair_id=signer.key_id,
+        expire_time=expire_time,
+    )
+
+
+def apply_policy(url: str, signed_policy: SignedPolicy) -> str:
+    """!
+    @brief Attach a signed custom policy to an object URL
+    @param url object URL covered by the policy resource
+    @param signed_policy previously signed policy
+    @return signed URL
+    """
+    separator = "&" if "?" in url else "?"
+    return f"{url}{separator}{signed_policy.query_string}"
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Optional
 
 
 class Settings(BaseSettings):
@@ -8,6 +8,31 @@ class Settings(BaseSettings):
     KEY_PAIR_ID: str
     S3_PRIVATE_KEY: str
     CORS_ALLOWED_ORIGINS: List[str] = ["*"]
+    SIGNED_URL_CACHE_SIZE: int = 4096
+    SIGNED_URL_CACHE_MIN_REMAINING_RATIO: float = 0.5
+    SIGNING_POOL_KIND: str = "thread"
+    SIGNING_POOL_WORKERS: int = 4
+    SIGNING_CHUNK_SIZE: int = 32
+    SIGNING_PARALLEL_THRESHOLD: int = 16
+    SIGNED_URL_BATCH_MAX_KEYS: int = 1000
+    SIGNED_URL_STREAM_MAX_KEYS: int = 20000
+    SIGNED_URL_EXPIRY_BUCKET_SECONDS: int = 0
+    CLOUDFRONT_COOKIE_EXPIRE_TIME: int = 60
+    CLOUDFRONT_COOKIE_DOMAIN: Optional[str] = None
+    DB_HOST: str = "db"
+    DB_PORT: int = 5432
+    DB_NAME: str = "userdb"
+    DB_USER: str = "user"
+    DB_PASSWORD: str = "password"
+    DB_POOL_MIN_SIZE: int = 1
+    DB_POOL_MAX_SIZE: int = 10
+    PLAYLIST_CACHE_SIZE: int = 256
+    PLAYLIST_MAX_SEGMENTS: int = 2000
+    PLAYLIST_REFRESH_SECONDS: float = 2.0
+    PLAYLIST_REBUILD_SECONDS: float = 300.0
+    PLAYLIST_URL_MARGIN_SECONDS: int = 600
+    PLAYLIST_SEGMENT_FILE_TYPES: List[str] = ["ts"]
+    SEGMENT_PAGE_MAX_SIZE: int = 500
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,55 @@
+import asyncio
+import datetime
+import asyncpg
+from typing import Optional
+from config import settings
+
+
+class Database:
+    """!
+    @brief Lazily created asyncpg connection pool for the shared user_db
+    @details The pool is only opened on first use so play_server can start (and
+             answer health checks) without a reachable database.
+    """
+
+    def __init__(self):
+        self._pool: Optional[asyncpg.Pool] = None
+        self._lock = asyncio.Lock()
+
+    async def get_pool(self) -> asyncpg.Pool:
+        if self._pool is None:
+            async with self._lock:
+                if self._pool is None:
+                    self._pool = await asyncpg.create_pool(
+                        host=settings.DB_HOST,
+                        port=settings.DB_PORT,
+                        database=settings.DB_NAME,
+                        user=settings.DB_USER,
+                        password=settings.DB_PASSWORD,
+                        min_size=settings.DB_POOL_MIN_SIZE,
+                        max_size=settings.DB_POOL_MAX_SIZE,
+                    )
+        return self._pool
+
+    async def fetch(self, query: str, *args):
+        pool = await self.get_pool()
+        return await pool.fetch(query, *args)
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+
+def to_db_timestamp(value: Optional[datetime.datetime]):
+    """!
+    @brief metadata timestamps are stored as UTC TIMESTAMP without time zone
+    @param value naive (assumed UTC) or aware datetime
+    @return naive UTC datetime or None
+    """
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+
+db = Database()
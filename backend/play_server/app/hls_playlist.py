@@ -0,0 +1,151 @@
+import asyncio
+import datetime
+import math
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, List, Optional, Sequence, Tuple
+from metadata import Segment
+
+FetchSegments = Callable[
+    [str, datetime.datetime, Optional[datetime.datetime], Optional[Segment], int],
+    Awaitable[List[Segment]],
+]
+
+
+class CachedPlaylist:
+    """!
+    @brief Segment list of one (blackbox, time range) with pre-rendered #EXTINF lines
+    @details New segments are appended after the last known one; the rendered
+             lines of existing segments are never rebuilt on append.
+    """
+
+    def __init__(self, ended: bool = False):
+        self.ended = ended
+        self.segments: List[Segment] = []
+        self.lines: List[str] = []
+        self.target_duration = 1
+        self.built_at = time.monotonic()
+        self.refreshed_at = 0.0
+
+    @property
+    def last(self) -> Optional[Segment]:
+        return self.segments[-1] if self.segments else None
+
+    def extend(self, segments: Sequence[Segment]):
+        for segment in segments:
+            prefix = ""
+            if self.last is not None and (
+                self.last.stream_started_at != segment.stream_started_at
+            ):
+                prefix = "#EXT-X-DISCONTINUITY\n"
+            self.lines.append(f"{prefix}#EXTINF:{segment.duration:.3f},\n")
+            self.segments.append(segment)
+            self.target_duration = max(
+                self.target_duration, math.ceil(segment.duration)
+            )
+
+
+class PlaylistCache:
+    """!
+    @brief LRU cache of playlists that is refreshed incrementally from the database
+    @details A playlist is polled for new segments at most every refresh_seconds.
+             Live (EVENT) playlists are append-only, as HLS requires, so segments
+             deleted after being listed stay in them. Once a playlist has ended
+             it is fully rebuilt every rebuild_seconds, which is how deleted
+             segments drop out; the first rebuild waits rebuild_seconds after
+             the end so that players following the EVENT playlist have already
+             received its final, append-only version.
+    """
+
+    def __init__(
+        self,
+        fetch_segments: FetchSegments,
+        max_entries: int = 256,
+        max_segments: int = 2000,
+        refresh_seconds: float = 2.0,
+        rebuild_seconds: float = 300.0,
+    ):
+        self.fetch_segments = fetch_segments
+        self.max_entries = max_entries
+        self.max_segments = max_segments
+        self.refresh_seconds = refresh_seconds
+        self.rebuild_seconds = rebuild_seconds
+        self._entries: "OrderedDict[tuple, CachedPlaylist]" = OrderedDict()
+        self._locks = {}
+
+    async def get(
+        self,
+        blackbox_uuid: str,
+        start: datetime.datetime,
+        end: Optional[datetime.datetime],
+        ended: bool = False,
+    ) -> Tuple[List[Segment], List[str], int]:
+        """!
+        @brief Current segments of a playlist, fetching only what is new
+        @param blackbox_uuid blackbox whose segments are listed
+        @param start inclusive lower bound on stream_started_at (naive UTC)
+        @param end exclusive upper bound on stream_started_at (naive UTC), None for
+                   open-ended
+        @param ended True once no more segments can appear in the range
+        @return snapshot of (segments, rendered #EXTINF lines, target duration)
+        """
+        key = (blackbox_uuid, start, end)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            now = time.monotonic()
+            entry = self._entries.get(key)
+            if entry is not None and ended and not entry.ended:
+                entry.ended = True
+                entry.built_at = now
+            if entry is None or (
+                entry.ended and now - entry.built_at > self.rebuild_seconds
+            ):
+                entry = CachedPlaylist(ended)
+            if now - entry.refreshed_at > self.refresh_seconds:
+                remaining = self.max_segments - len(entry.segments)
+                if remaining > 0:
+                    entry.extend(
+                        await self.fetch_segments(
+                            blackbox_uuid, start, end, entry.last, remaining
+                        )
+                    )
+                entry.refreshed_at = now
+            self._store(key, entry)
+            return list(entry.segments), list(entry.lines), entry.target_duration
+
+    def _store(self, key: tuple, entry: CachedPlaylist):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            lock = self._locks.get(evicted)
+            if lock is not None and not lock.locked():
+                del self._locks[evicted]
+
+
+def render_media_playlist(
+    lines: Sequence[str], uris: Sequence[str], target_duration: int, ended: bool
+) -> str:
+    """!
+    @brief Assemble an HLS media playlist from pre-rendered lines and segment URIs
+    @details Segments are MPEG-TS (see PLAYLIST_SEGMENT_FILE_TYPES), which HLS
+             version 3 plays without an EXT-X-MAP initialization segment.
+    @param lines #EXTINF (and #EXT-X-DISCONTINUITY) lines, one per segment
+    @param uris signed segment URIs, in the same order as lines
+    @param target_duration #EXT-X-TARGETDURATION value
+    @param ended True when no more segments can appear (adds #EXT-X-ENDLIST)
+    @return m3u8 document
+    """
+    parts = [
+        "#EXTM3U\n",
+        "#EXT-X-VERSION:3\n",
+        f"#EXT-X-TARGETDURATION:{target_duration}\n",
+        "#EXT-X-MEDIA-SEQUENCE:0\n",
+        f"#EXT-X-PLAYLIST-TYPE:{'VOD' if ended else 'EVENT'}\n",
+    ]
+    for line, uri in zip(lines, uris):
+        parts.append(line)
+        parts.append(f"{uri}\n")
+    if ended:
+        parts.append("#EXT-X-ENDLIST\n")
+    return "".join(parts)
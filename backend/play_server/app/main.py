@@ -1,31 +1,46 @@
 import datetime
-from fastapi import FastAPI
+import hashlib
+import json
+import math
+from functools import partial
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from botocore.signers import CloudFrontSigner
-from cryptography.hazmat.primitives import serialization, hashes
-from cryptography.hazmat.primitives.asymmetric import padding
-from typing import List, Tuple
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple, Union
 from prometheus_fastapi_instrumentator import Instrumentator
 from config import settings
-
-private_key = serialization.load_pem_private_key(
-    settings.S3_PRIVATE_KEY.encode(), password=None
+from signed_url_cache import SignedURLCache
+from batch_signer import BatchSigner
+from url_signer import signer, sign_urls
+from cloudfront_policy import SignedPolicy, sign_custom_policy, apply_policy
+from database import db, to_db_timestamp
+from metadata import (
+    Segment,
+    fetch_playlist_segments,
+    fetch_segment_page,
+    encode_cursor,
+    decode_cursor,
 )
+from hls_playlist import PlaylistCache, render_media_playlist
 
+signed_url_cache = SignedURLCache(
+    max_size=settings.SIGNED_URL_CACHE_SIZE,
+    min_remaining_ratio=settings.SIGNED_URL_CACHE_MIN_REMAINING_RATIO,
+)
 
-def rsa_signer(message: bytes) -> bytes:
-    """!
-    @brief
-    @param
-    @return
-    """
-    return private_key.sign(message, padding.PKCS1v15(), hashes.SHA1())
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    batch_signer.shutdown()
+    await db.close()
 
-signer = CloudFrontSigner(settings.KEY_PAIR_ID, rsa_signer)
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 Instrumentator().instrument(app).expose(app)  # Add prometheus
 
@@ -38,23 +53,189 @@ app.add_middleware(
 )
 
 
+def quantized_expire_time(
+    lifetime: datetime.timedelta,
+) -> Optional[datetime.datetime]:
+    """!
+    @brief Round now + lifetime up to the next SIGNED_URL_EXPIRY_BUCKET_SECONDS boundary
+    @param lifetime minimum lifetime of the signature
+    @return bucket boundary, or None when quantization is disabled
+    """
+    bucket_seconds = settings.SIGNED_URL_EXPIRY_BUCKET_SECONDS
+    if bucket_seconds <= 0:
+        return None
+    deadline = datetime.datetime.now(datetime.timezone.utc) + lifetime
+    boundary = math.ceil(deadline.timestamp() / bucket_seconds) * bucket_seconds
+    return datetime.datetime.fromtimestamp(boundary, datetime.timezone.utc).replace(
+        tzinfo=None
+    )
+
+
 def generate_signed_url(
     object_key: str, expire_minutes: int = 1
 ) -> Tuple[str, datetime.datetime]:
     """!
-    @brief
-    @param
-    @param
-    @return
+    @brief Sign a CloudFront URL, reusing a cached one while it has enough life left
+    @details With expiry quantization enabled every request inside one bucket gets
+             the same date_less_than and therefore a byte-identical URL.
+    @param object_key storage object key
+    @param expire_minutes lifetime of the signed URL
+    @return (signed_url, expire_time)
     """
-    expire_time = datetime.datetime.utcnow() + datetime.timedelta(
-        minutes=expire_minutes
+    return generate_signed_urls([object_key], expire_minutes)[0]
+
+
+def generate_signed_urls(
+    object_keys: List[str],
+    expire_minutes: int = 1,
+    min_remaining: Optional[Sequence[datetime.timedelta]] = None,
+) -> List[Tuple[str, datetime.datetime]]:
+    """!
+    @brief Sign a batch of object keys, serving what it can from the cache
+    @details The cache is checked and filled here, in the app process; only the
+             misses are handed to the batch signer, whose pool may run in other
+             processes.
+    @param object_keys storage object keys
+    @param expire_minutes lifetime of the signed URLs
+    @param min_remaining optional per-key lifetime a cached URL must still have to
+                         be reused, in the same order as object_keys
+    @return list of (signed_url, expire_time) in input order
+    """
+    lifetime = datetime.timedelta(minutes=expire_minutes)
+    quantized = quantized_expire_time(lifetime)
+    bucket = expire_minutes if quantized is None else (expire_minutes, quantized)
+    if min_remaining is None:
+        min_remaining = [None] * len(object_keys)
+    results = [
+        signed_url_cache.get(key, bucket, needed)
+        for key, needed in zip(object_keys, min_remaining)
+    ]
+    misses = [i for i, cached in enumerate(results) if cached is None]
+    if not misses:
+        return results
+
+    expire_time = quantized or datetime.datetime.utcnow() + lifetime
+    signed_urls = batch_signer.sign(
+        [f"{settings.CLOUDFRONT_DOMAIN}/{object_keys[i]}" for i in misses],
+        expire_time,
     )
+    for i, signed_url in zip(misses, signed_urls):
+        signed_url_cache.put(object_keys[i], bucket, signed_url, expire_time, lifetime)
+        results[i] = (signed_url, expire_time)
+    return results
 
-    signed_url = signer.generate_presigned_url(
-        f"{settings.CLOUDFRONT_DOMAIN}/{object_key}", date_less_than=expire_time
+
+def generate_playlist_urls(
+    segments: Sequence[Segment],
+) -> List[Tuple[str, datetime.datetime, int]]:
+    """!
+    @brief Sign the segment URIs of a playlist so each outlives its own playback
+    @details Players fetch an ended (#EXT-X-ENDLIST) playlist once and never
+             reload it, so a segment's URI has to stay valid until playback
+             reaches its end: its offset in the playlist plus its duration, plus
+             PLAYLIST_URL_MARGIN_SECONDS. A URI is signed for that time rounded
+             up to a whole margin step plus one more step, which only depends on
+             the segment's own offset. Repeat polls and appends therefore reuse
+             the cached URIs of the existing segments for at least one step.
+    @param segments segments listed in the playlist, in playback order
+    @return (signed_url, expire_time, expire_minutes) per segment, in order
+    """
+    step_minutes = max(1, math.ceil(settings.PLAYLIST_URL_MARGIN_SECONDS / 60))
+    step = step_minutes * 60
+    groups: Dict[int, List[int]] = {}
+    needed = []
+    offset = 0
+    for i, segment in enumerate(segments):
+        offset += segment.duration
+        required = offset + settings.PLAYLIST_URL_MARGIN_SECONDS
+        needed.append(datetime.timedelta(seconds=required))
+        minutes = max(
+            settings.CLOUDFRONT_EXPIRE_TIME,
+            (math.ceil(required / step) + 1) * step_minutes,
+        )
+        groups.setdefault(minutes, []).append(i)
+
+    results: List[Optional[Tuple[str, datetime.datetime, int]]] = [None] * len(segments)
+    for minutes, indexes in groups.items():
+        signed = generate_signed_urls(
+            [segments[i].object_key for i in indexes],
+            minutes,
+            [needed[i] for i in indexes],
+        )
+        for i, (signed_url, expire_time) in zip(indexes, signed):
+            results[i] = (signed_url, expire_time, minutes)
+    return results
+
+
+def generate_prefix_policy(
+    prefix: str,
+    expire_minutes: int,
+    not_before: Optional[datetime.datetime] = None,
+) -> SignedPolicy:
+    """!
+    @brief Sign one wildcard custom policy covering every object under a prefix
+    @param prefix object key prefix (e.g. a blackbox uuid followed by "/")
+    @param expire_minutes lifetime of the policy
+    @param not_before optional start of the validity window
+    @return SignedPolicy shared by all objects under the prefix
+    """
+    lifetime = datetime.timedelta(minutes=expire_minutes)
+    quantized = quantized_expire_time(lifetime)
+    bucket = ("policy", expire_minutes, not_before, quantized)
+    cached = signed_url_cache.get(prefix, bucket)
+    if cached is not None:
+        return cached[0]
+
+    expire_time = quantized or datetime.datetime.utcnow() + lifetime
+
+    signed_policy = sign_custom_policy(
+        signer,
+        f"{settings.CLOUDFRONT_DOMAIN}/{prefix}*",
+        expire_time,
+        date_greater_than=not_before,
     )
-    return signed_url, expire_time
+    signed_url_cache.put(prefix, bucket, signed_policy, expire_time, lifetime)
+    return signed_policy
+
+
+async def stream_signed_urls(
+    object_keys: List[str],
+    expire_minutes: int = 1,
+    extras: Optional[List[dict]] = None,
+) -> AsyncIterator[bytes]:
+    """!
+    @brief Yield one NDJSON line per signed URL as soon as its chunk is signed
+    @param object_keys storage object keys
+    @param expire_minutes lifetime of the signed URLs
+    @param extras optional JSON-ready fields merged into each line, one per key
+    @return async iterator of encoded NDJSON lines, in input order
+    """
+    chunk_size = max(1, settings.SIGNING_CHUNK_SIZE)
+    for start in range(0, len(object_keys), chunk_size):
+        chunk = object_keys[start : start + chunk_size]
+        signed = await run_in_threadpool(generate_signed_urls, chunk, expire_minutes)
+        for offset, (signed_url, expire_time) in enumerate(signed):
+            item = {"signed_url": signed_url, "expire_time": expire_time.isoformat()}
+            if extras is not None:
+                item.update(extras[start + offset])
+            yield f"{json.dumps(item)}\n".encode()
+
+
+batch_signer = BatchSigner(
+    sign_urls,
+    pool_kind=settings.SIGNING_POOL_KIND,
+    max_workers=settings.SIGNING_POOL_WORKERS,
+    chunk_size=settings.SIGNING_CHUNK_SIZE,
+    parallel_threshold=settings.SIGNING_PARALLEL_THRESHOLD,
+)
+
+playlist_cache = PlaylistCache(
+    partial(fetch_playlist_segments, file_types=settings.PLAYLIST_SEGMENT_FILE_TYPES),
+    max_entries=settings.PLAYLIST_CACHE_SIZE,
+    max_segments=settings.PLAYLIST_MAX_SEGMENTS,
+    refresh_seconds=settings.PLAYLIST_REFRESH_SECONDS,
+    rebuild_seconds=settings.PLAYLIST_REBUILD_SECONDS,
+)
 
 
 class SignedURLResponse(BaseModel):
@@ -64,6 +245,15 @@ class SignedURLResponse(BaseModel):
     expire_time: datetime.datetime
 
 
+class SegmentSignedURLResponse(SignedURLResponse):
+    """! @brief Signed URL of a selector result with its segment metadata"""
+
+    object_key: str
+    duration: Optional[int]
+    file_size: Optional[int]
+    stream_started_at: datetime.datetime
+
+
 class ObjectKeyRequest(BaseModel):
     """! @brief"""
 
@@ -71,44 +261,426 @@ class ObjectKeyRequest(BaseModel):
 
 
 class ObjectKeysRequest(BaseModel):
-    """! @brief"""
+    """! @brief Raw object keys, or a blackbox/time-range selector over metadata"""
 
-    object_keys: List[str]
+    object_keys: List[str] = []
+    blackbox_uuid: Optional[str] = None
+    start: Optional[datetime.datetime] = None
+    end: Optional[datetime.datetime] = None
+    file_type: Optional[str] = None
 
 
 class SignedURLListResponse(BaseModel):
     """! @brief"""
 
+    signed_urls: List[Union[SegmentSignedURLResponse, SignedURLResponse]]
+
+
+class PrefixPolicyRequest(BaseModel):
+    """! @brief Objects under one prefix to be covered by a single custom policy"""
+
+    prefix: str
+    object_keys: List[str] = []
+    not_before: Optional[datetime.datetime] = None
+
+
+class PrefixPolicyResponse(BaseModel):
+    """! @brief Shared custom policy plus the per-object URLs it signs"""
+
+    policy: str
+    signature: str
+    key_pair_id: str
+    expire_time: datetime.datetime
     signed_urls: List[SignedURLResponse]
 
 
+class SignedCookieRequest(BaseModel):
+    """! @brief Blackbox path to be unlocked for a playback session"""
+
+    prefix: str
+
+
+class SignedCookieResponse(BaseModel):
+    """! @brief Resource covered by the issued cookies and their values"""
+
+    resource: str
+    expire_time: datetime.datetime
+    cookies: Dict[str, str]
+
+
+class SegmentResponse(BaseModel):
+    """! @brief One non-deleted metadata row"""
+
+    id: str
+    object_key: Optional[str]
+    file_type: Optional[str]
+    file_size: Optional[int]
+    duration: Optional[int]
+    stream_started_at: datetime.datetime
+    created_at: Optional[datetime.datetime]
+
+
+class SegmentPageResponse(BaseModel):
+    """! @brief One keyset page of segments and the cursor of the next page"""
+
+    segments: List[SegmentResponse]
+    next_cursor: Optional[str]
+
+
+def _check_prefix(prefix: str):
+    # The policy resource is "{prefix}*"; without the trailing "/" a prefix
+    # "abc" would also cover "abcd.../" objects of another blackbox.
+    if (
+        not prefix.rstrip("/")
+        or not prefix.endswith("/")
+        or any(c in prefix for c in "*?")
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="prefix must be a non-empty path ending with '/' and must not "
+            "contain wildcards",
+        )
+
+
+def _check_batch_size(size: int, limit: Optional[int] = None):
+    limit = settings.SIGNED_URL_BATCH_MAX_KEYS if limit is None else limit
+    if size > limit:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many object keys (max {limit})",
+        )
+
+
+def _conditional_response(
+    http_request: Request,
+    content: bytes,
+    media_type: str,
+    stable_until: datetime.datetime,
+) -> Response:
+    """!
+    @brief Attach ETag/Cache-Control and evaluate If-None-Match
+    @details A match answers GET/HEAD with 304 and every other method (the POST
+             signing endpoints) with 412, as RFC 9110 section 13.1.2 requires.
+    @param http_request incoming request
+    @param content serialized response body
+    @param media_type response media type
+    @param stable_until instant up to which a repeat request yields the same body
+    @return 200 response with content, or an empty 304/412
+    """
+    etag = f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+    max_age = max(0, int((stable_until - datetime.datetime.utcnow()).total_seconds()))
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={max_age}"}
+    if_none_match = http_request.headers.get("if-none-match", "")
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    if etag in tags or "*" in tags:
+        if http_request.method in ("GET", "HEAD"):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(
+            status_code=status.HTTP_412_PRECONDITION_FAILED, headers=headers
+        )
+    return Response(content=content, media_type=media_type, headers=headers)
+
+
+def _stable_until(
+    expire_times: List[datetime.datetime], expire_minutes: int
+) -> datetime.datetime:
+    """!
+    @brief Instant at which a quantized signature would move to the next bucket
+    @param expire_times expiries handed out in the response
+    @param expire_minutes lifetime the signatures were requested with
+    @return earliest expiry minus the lifetime, or now when nothing was signed
+    """
+    if not expire_times:
+        return datetime.datetime.utcnow()
+    return min(expire_times) - datetime.timedelta(minutes=expire_minutes)
+
+
+def _json_body(model: BaseModel) -> bytes:
+    return model.model_dump_json().encode()
+
+
 @app.get("/videos")
 def health():
     return {"status": "ok"}
 
 
 @app.post("/videos/url", response_model=SignedURLResponse)
-def get_signed_url(request: ObjectKeyRequest):
+def get_signed_url(request: ObjectKeyRequest, http_request: Request):
     """!
-    @brief
-    @param
-    @return
+    @brief Sign a single object key
+    @param request object key to sign
+    @param http_request raw request, used for conditional requests
+    @return signed URL and its expiry
     """
     signed_url, expire_time = generate_signed_url(
         request.object_key, settings.CLOUDFRONT_EXPIRE_TIME
     )
+    if settings.SIGNED_URL_EXPIRY_BUCKET_SECONDS > 0:
+        return _conditional_response(
+            http_request,
+            _json_body(
+                SignedURLResponse(signed_url=signed_url, expire_time=expire_time)
+            ),
+            "application/json",
+            _stable_until([expire_time], settings.CLOUDFRONT_EXPIRE_TIME),
+        )
     return {"signed_url": signed_url, "expire_time": expire_time}
 
 
-@app.post("/videos/urls", response_model=SignedURLListResponse)
-def get_signed_urls(request: ObjectKeysRequest):
+async def _resolve_selector(
+    request: ObjectKeysRequest, limit: int
+) -> Tuple[List[str], List[dict]]:
     """!
-    @brief
-    @param
-    @return
+    @brief Resolve a blackbox/time-range selector to object keys in one query
+    @param request request carrying blackbox_uuid and optional range/file_type
+    @param limit maximum number of keys the caller may sign
+    @return (object_keys, per-key metadata fields)
     """
-    response_urls = []
-    for key in request.object_keys:
-        signed_url, expire_time = generate_signed_url(key)
-        response_urls.append({"signed_url": signed_url, "expire_time": expire_time})
+    segments = await fetch_segment_page(
+        request.blackbox_uuid,
+        request.start,
+        request.end,
+        request.file_type,
+        limit=limit + 1,
+        with_object_key=True,
+    )
+    _check_batch_size(len(segments), limit)
+    return [segment.object_key for segment in segments], [
+        {
+            "object_key": segment.object_key,
+            "duration": segment.duration,
+            "file_size": segment.file_size,
+            "stream_started_at": segment.stream_started_at,
+        }
+        for segment in segments
+    ]
+
+
+@app.post(
+    "/videos/urls",
+    response_model=SignedURLListResponse,
+)
+async def get_signed_urls(request: ObjectKeysRequest, http_request: Request):
+    """!
+    @brief Sign a batch of object keys, given directly or selected from metadata
+    @param request object keys, or a blackbox_uuid with optional start/end/file_type
+    @param http_request raw request; Accept: application/x-ndjson streams the result
+    @return signed URLs in input order, as one JSON document or as NDJSON lines;
+            selector requests also carry duration, file_size and stream_started_at
+    """
+    if request.object_keys and request.blackbox_uuid:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide either object_keys or blackbox_uuid, not both",
+        )
+    if not request.blackbox_uuid and any(
+        value is not None for value in (request.start, request.end, request.file_type)
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start, end and file_type require blackbox_uuid",
+        )
+    streaming = "application/x-ndjson" in http_request.headers.get("accept", "")
+    limit = (
+        settings.SIGNED_URL_STREAM_MAX_KEYS
+        if streaming
+        else settings.SIGNED_URL_BATCH_MAX_KEYS
+    )
+
+    object_keys, extras = request.object_keys, None
+    if request.blackbox_uuid:
+        object_keys, extras = await _resolve_selector(request, limit)
+    _check_batch_size(len(object_keys), limit)
+
+    if streaming:
+        return StreamingResponse(
+            stream_signed_urls(
+                object_keys, extras=jsonable_encoder(extras) if extras else None
+            ),
+            media_type="application/x-ndjson",
+        )
+
+    signed = await run_in_threadpool(generate_signed_urls, object_keys)
+    response_urls = [
+        {"signed_url": signed_url, "expire_time": expire_time}
+        for signed_url, expire_time in signed
+    ]
+    if extras is not None:
+        for item, extra in zip(response_urls, extras):
+            item.update(extra)
+    if settings.SIGNED_URL_EXPIRY_BUCKET_SECONDS > 0:
+        return _conditional_response(
+            http_request,
+            _json_body(SignedURLListResponse(signed_urls=response_urls)),
+            "application/json",
+            _stable_until([expire_time for _, expire_time in signed], 1),
+        )
     return {"signed_urls": response_urls}
+
+
+@app.post("/videos/urls/prefix", response_model=PrefixPolicyResponse)
+def get_prefix_signed_urls(request: PrefixPolicyRequest):
+    """!
+    @brief Sign every object under a prefix with one wildcard custom policy
+    @param request prefix, optional object keys and optional validity start
+    @return shared policy, signature and key-pair id plus per-object URLs
+    """
+    _check_prefix(request.prefix)
+    _check_batch_size(len(request.object_keys))
+    outside = [key for key in request.object_keys if not key.startswith(request.prefix)]
+    if outside:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Object keys outside of prefix {request.prefix}: {outside[:5]}",
+        )
+
+    signed_policy = generate_prefix_policy(
+        request.prefix, settings.CLOUDFRONT_EXPIRE_TIME, request.not_before
+    )
+    return {
+        "policy": signed_policy.policy,
+        "signature": signed_policy.signature,
+        "key_pair_id": signed_policy.key_pair_id,
+        "expire_time": signed_policy.expire_time,
+        "signed_urls": [
+            {
+                "signed_url": apply_policy(
+                    f"{settings.CLOUDFRONT_DOMAIN}/{key}", signed_policy
+                ),
+                "expire_time": signed_policy.expire_time,
+            }
+            for key in request.object_keys
+        ],
+    }
+
+
+@app.post("/videos/cookies", response_model=SignedCookieResponse)
+def get_signed_cookies(request: SignedCookieRequest, response: Response):
+    """!
+    @brief Issue CloudFront signed cookies scoped to a blackbox path
+    @param request prefix of the blackbox objects to unlock
+    @param response response the CloudFront-* cookies are attached to
+    @return covered resource, expiry and the cookie values
+    @exception HTTPException 503 when CLOUDFRONT_COOKIE_DOMAIN is not configured
+    """
+    if not settings.CLOUDFRONT_COOKIE_DOMAIN:
+        # Host-only cookies would stay on play_server and never reach CloudFront.
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Signed cookies are not configured (CLOUDFRONT_COOKIE_DOMAIN)",
+        )
+    _check_prefix(request.prefix)
+    signed_policy = generate_prefix_policy(
+        request.prefix, settings.CLOUDFRONT_COOKIE_EXPIRE_TIME
+    )
+    cookies = {
+        "CloudFront-Policy": signed_policy.policy,
+        "CloudFront-Signature": signed_policy.signature,
+        "CloudFront-Key-Pair-Id": signed_policy.key_pair_id,
+    }
+    max_age = int(
+        (signed_policy.expire_time - datetime.datetime.utcnow()).total_seconds()
+    )
+    for name, value in cookies.items():
+        response.set_cookie(
+            name,
+            value,
+            max_age=max_age,
+            path=f"/{request.prefix}",
+            domain=settings.CLOUDFRONT_COOKIE_DOMAIN,
+            secure=True,
+            httponly=True,
+            samesite="none",
+        )
+    return {
+        "resource": f"{settings.CLOUDFRONT_DOMAIN}/{request.prefix}*",
+        "expire_time": signed_policy.expire_time,
+        "cookies": cookies,
+    }
+
+
+@app.get("/videos/playlist.m3u8")
+async def get_playlist(
+    http_request: Request,
+    blackbox_uuid: str,
+    start: datetime.datetime,
+    end: Optional[datetime.datetime] = None,
+):
+    """!
+    @brief HLS media playlist of a blackbox's non-deleted segments in a time range
+    @param http_request raw request, used for conditional requests
+    @param blackbox_uuid blackbox whose recordings are played
+    @param start inclusive lower bound on stream_started_at
+    @param end exclusive upper bound on stream_started_at, omit for a live playlist
+    @return m3u8 document with signed segment URIs
+    """
+    start, end = to_db_timestamp(start), to_db_timestamp(end)
+    if end is not None and end <= start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="end must be later than start",
+        )
+    ended = end is not None and end <= datetime.datetime.utcnow()
+    segments, lines, target_duration = await playlist_cache.get(
+        blackbox_uuid, start, end, ended
+    )
+    signed = await run_in_threadpool(generate_playlist_urls, segments)
+    content = render_media_playlist(
+        lines,
+        [signed_url for signed_url, _, _ in signed],
+        target_duration,
+        ended,
+    )
+    media_type = "application/vnd.apple.mpegurl"
+    if settings.SIGNED_URL_EXPIRY_BUCKET_SECONDS > 0:
+        stable_until = min(
+            [
+                _stable_until([expire_time], minutes)
+                for _, expire_time, minutes in signed
+            ],
+            default=datetime.datetime.utcnow(),
+        )
+        if not ended:
+            stable_until = min(
+                stable_until,
+                datetime.datetime.utcnow()
+                + datetime.timedelta(seconds=settings.PLAYLIST_REFRESH_SECONDS),
+            )
+        return _conditional_response(
+            http_request, content.encode(), media_type, stable_until
+        )
+    return Response(content=content, media_type=media_type)
+
+
+@app.get("/videos/segments", response_model=SegmentPageResponse)
+async def list_segments(
+    blackbox_uuid: str,
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    file_type: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=settings.SEGMENT_PAGE_MAX_SIZE),
+):
+    """!
+    @brief Keyset-paginated listing of a blackbox's non-deleted segments
+    @param blackbox_uuid blackbox whose recordings are listed
+    @param start inclusive lower bound on stream_started_at
+    @param end exclusive upper bound on stream_started_at
+    @param file_type exact file_type filter
+    @param cursor next_cursor of the previous page
+    @param limit page size
+    @return segments ordered by (stream_started_at, id) and the next cursor
+    """
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    segments = await fetch_segment_page(
+        blackbox_uuid, start, end, file_type, after, limit + 1
+    )
+    next_cursor = encode_cursor(segments[limit - 1]) if len(segments) > limit else None
+    return {
+        "segments": [segment._asdict() for segment in segments[:limit]],
+        "next_cursor": next_cursor,
+    }
@@ -0,0 +1,153 @@
+import base64
+import datetime
+import json
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+from database import db, to_db_timestamp
+
+
+class Segment(NamedTuple):
+    """! @brief One recorded video segment from the metadata table"""
+
+    id: str
+    object_key: Optional[str]
+    duration: Optional[int]
+    stream_started_at: datetime.datetime
+    created_at: Optional[datetime.datetime]
+    file_size: Optional[int] = None
+    file_type: Optional[str] = None
+
+
+PLAYLIST_SEGMENTS_QUERY = """
+SELECT id, object_key, duration, stream_started_at,
+       COALESCE(created_at, stream_started_at) AS created_at
+FROM metadata
+WHERE blackbox_uuid = $1
+  AND is_deleted = false
+  AND object_key IS NOT NULL
+  AND duration IS NOT NULL
+  AND lower(file_type) = ANY($8::varchar[])
+  AND stream_started_at >= $2
+  AND ($3::timestamp IS NULL OR stream_started_at < $3)
+  AND (
+    $4::timestamp IS NULL
+    OR (stream_started_at, COALESCE(created_at, stream_started_at), id)
+       > ($4::timestamp, $5::timestamp, $6::varchar)
+  )
+ORDER BY stream_started_at, COALESCE(created_at, stream_started_at), id
+LIMIT $7
+"""
+
+
+async def fetch_playlist_segments(
+    blackbox_uuid: str,
+    start: datetime.datetime,
+    end: Optional[datetime.datetime],
+    after: Optional[Segment],
+    limit: int,
+    file_types: Sequence[str] = ("ts",),
+) -> List[Segment]:
+    """!
+    @brief Non-deleted, HLS-playable segments of a blackbox in playback order
+    @details Only rows whose file_type is one of file_types are listed; other
+             recordings (e.g. plain mp4) are not valid HLS media segments.
+    @param blackbox_uuid blackbox whose segments are listed
+    @param start inclusive lower bound on stream_started_at
+    @param end exclusive upper bound on stream_started_at, None for open-ended
+    @param after last segment already known; only later segments are returned
+    @param limit maximum number of rows
+    @param file_types playable file types, compared case-insensitively
+    @return segments ordered by (stream_started_at, created_at, id)
+    """
+    rows = await db.fetch(
+        PLAYLIST_SEGMENTS_QUERY,
+        blackbox_uuid,
+        to_db_timestamp(start),
+        to_db_timestamp(end),
+        after.stream_started_at if after else None,
+        after.created_at if after else None,
+        after.id if after else None,
+        limit,
+        [file_type.lower() for file_type in file_types],
+    )
+    return [Segment(**dict(row)) for row in rows]
+
+
+def encode_cursor(segment: Segment) -> str:
+    """!
+    @brief Opaque keyset cursor pointing just after a segment
+    @param segment last segment of a page
+    @return url-safe cursor string
+    """
+    raw = json.dumps([segment.stream_started_at.isoformat(), segment.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime.datetime, str]:
+    """!
+    @brief Inverse of encode_cursor
+    @param cursor cursor returned by a previous page
+    @return (stream_started_at, id) of the last segment of that page
+    @exception ValueError when the cursor is malformed
+    """
+    try:
+        started_at, segment_id = json.loads(base64.urlsafe_b64decode(cursor))
+        return datetime.datetime.fromisoformat(started_at), str(segment_id)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+
+async def fetch_segment_page(
+    blackbox_uuid: str,
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    file_type: Optional[str] = None,
+    after: Optional[Tuple[datetime.datetime, str]] = None,
+    limit: int = 100,
+    with_object_key: bool = False,
+) -> List[Segment]:
+    """!
+    @brief One keyset page of non-deleted segments ordered by (stream_started_at, id)
+    @details Only the filters that are set become conditions, so every variant is
+             served by idx_metadata_blackbox_started_id without an OFFSET scan.
+    @param blackbox_uuid blackbox whose segments are listed
+    @param start inclusive lower bound on stream_started_at
+    @param end exclusive upper bound on stream_started_at
+    @param file_type exact file_type filter
+    @param after (stream_started_at, id) of the last row of the previous page
+    @param limit maximum number of rows
+    @param with_object_key only rows that have an object_key
+    @return segments of the page
+    """
+    conditions = [
+        "blackbox_uuid = $1",
+        "is_deleted = false",
+        "stream_started_at IS NOT NULL",
+    ]
+    args = [blackbox_uuid]
+
+    def bind(value) -> str:
+        args.append(value)
+        return f"${len(args)}"
+
+    if start is not None:
+        conditions.append(f"stream_started_at >= {bind(to_db_timestamp(start))}")
+    if end is not None:
+        conditions.append(f"stream_started_at < {bind(to_db_timestamp(end))}")
+    if file_type is not None:
+        conditions.append(f"file_type = {bind(file_type)}")
+    if with_object_key:
+        conditions.append("object_key IS NOT NULL")
+    if after is not None:
+        started_at, segment_id = after
+        conditions.append(
+            f"(stream_started_at, id) > "
+            f"({bind(to_db_timestamp(started_at))}, {bind(segment_id)})"
+        )
+    query = (
+        "SELECT id, object_key, duration, stream_started_at, created_at, "
+        "file_size, file_type FROM metadata WHERE "
+        + " AND ".join(conditions)
+        + f" ORDER BY stream_started_at, id LIMIT {bind(limit)}"
+    )
+    rows = await db.fetch(query, *args)
+    return [Segment(**dict(row)) for row in rows]
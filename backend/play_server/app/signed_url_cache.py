@@ -0,0 +1,108 @@
+import datetime
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+from prometheus_client import Counter, Gauge
+
+SIGNED_URL_CACHE_HITS = Counter(
+    "signed_url_cache_hits", "Signed URLs served from the in-process cache"
+)
+SIGNED_URL_CACHE_MISSES = Counter(
+    "signed_url_cache_misses", "Signed URL lookups that required a new RSA signature"
+)
+SIGNED_URL_CACHE_EVICTIONS = Counter(
+    "signed_url_cache_evictions",
+    "Signed URLs dropped from the cache",
+    ["reason"],
+)
+SIGNED_URL_CACHE_SIZE = Gauge(
+    "signed_url_cache_size", "Number of signed URLs currently cached"
+)
+
+
+class SignedURLCache:
+    """!
+    @brief Size-bounded LRU cache of signed URLs keyed by (object_key, expiry bucket)
+    @details An entry is only handed out while it still has at least
+             min_remaining_ratio of its original lifetime left, so callers never
+             receive a URL that is about to expire.
+    """
+
+    def __init__(self, max_size: int = 1024, min_remaining_ratio: float = 0.5):
+        self.max_size = max_size
+        self.min_remaining_ratio = min_remaining_ratio
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def get(
+        self,
+        object_key: str,
+        bucket: Hashable,
+        min_remaining: Optional[datetime.timedelta] = None,
+    ) -> Optional[Tuple[Any, datetime.datetime]]:
+        """!
+        @brief Look up a cached signed URL that still has enough life left
+        @param object_key storage object key
+        @param bucket expiry bucket the URL was signed for
+        @param min_remaining remaining lifetime the caller needs; replaces the
+                             min_remaining_ratio check when given
+        @return (value, expire_time) or None on a miss
+        """
+        if not self.enabled:
+            return None
+        key = (object_key, bucket)
+        now = datetime.datetime.utcnow()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expire_time, lifetime = entry
+                required = (
+                    lifetime * self.min_remaining_ratio
+                    if min_remaining is None
+                    else min_remaining
+                )
+                if expire_time - now >= required:
+                    self._entries.move_to_end(key)
+                    SIGNED_URL_CACHE_HITS.inc()
+                    return value, expire_time
+                del self._entries[key]
+                SIGNED_URL_CACHE_EVICTIONS.labels(reason="expired").inc()
+                SIGNED_URL_CACHE_SIZE.set(len(self._entries))
+        SIGNED_URL_CACHE_MISSES.inc()
+        return None
+
+    def put(
+        self,
+        object_key: str,
+        bucket: Hashable,
+        value: Any,
+        expire_time: datetime.datetime,
+        lifetime: datetime.timedelta,
+    ):
+        """!
+        @brief Store a fresh signature, evicting the least recently used entries
+        @param object_key storage object key
+        @param bucket expiry bucket the URL was signed for
+        @param value signed CloudFront URL or signed policy
+        @param expire_time absolute expiry of the signature
+        @param lifetime full lifetime the URL was signed with
+        """
+        if not self.enabled:
+            return
+        key = (object_key, bucket)
+        with self._lock:
+            self._entries[key] = (value, expire_time, lifetime)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                SIGNED_URL_CACHE_EVICTIONS.labels(reason="capacity").inc()
+            SIGNED_URL_CACHE_SIZE.set(len(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            SIGNED_URL_CACHE_SIZE.set(0)
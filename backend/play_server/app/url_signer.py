@@ -0,0 +1,36 @@
+import datetime
+from typing import List, Sequence
+from botocore.signers import CloudFrontSigner
+from cryptography.hazmat.primitives import serialization, hashes
+from cryptography.hazmat.primitives.asymmetric import padding
+from config import settings
+
+private_key = serialization.load_pem_private_key(
+    settings.S3_PRIVATE_KEY.encode(), password=None
+)
+
+
+def rsa_signer(message: bytes) -> bytes:
+    """!
+    @brief
+    @param
+    @return
+    """
+    return private_key.sign(message, padding.PKCS1v15(), hashes.SHA1())
+
+
+signer = CloudFrontSigner(settings.KEY_PAIR_ID, rsa_signer)
+
+
+def sign_urls(urls: Sequence[str], expire_time: datetime.datetime) -> List[str]:
+    """!
+    @brief Sign a chunk of URLs with canned policies; the unit of work of the batch signer
+    @details Kept free of the app and its cache so that process-pool workers only
+             import the key material.
+    @param urls CloudFront URLs to sign
+    @param expire_time date_less_than shared by the chunk
+    @return signed URLs in input order
+    """
+    return [
+        signer.generate_presigned_url(url, date_less_than=expire_time) for url in urls
+    ]
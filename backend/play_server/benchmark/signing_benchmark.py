@@ -0,0 +1,200 @@
+"""!
+@file signing_benchmark.py
+@brief Offline signing throughput benchmark for play_server
+
+Uses a freshly generated RSA key and a dummy CLOUDFRONT_DOMAIN, so no network or
+AWS credentials are needed. Requires the play_server requirements plus httpx.
+
+    python backend/play_server/benchmark/signing_benchmark.py --output bench.json
+
+Pass --cache-size to measure with the signed-URL cache enabled (disabled by
+default so the numbers reflect raw RSA signing cost).
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+
+
+def _configure_env(args):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    ).decode()
+    os.environ["CLOUDFRONT_DOMAIN"] = "https://bench.invalid"
+    os.environ["KEY_PAIR_ID"] = "BENCHKEYPAIR"
+    os.environ["S3_PRIVATE_KEY"] = pem
+    os.environ["SIGNED_URL_CACHE_SIZE"] = str(args.cache_size)
+    os.environ["SIGNING_POOL_KIND"] = args.pool_kind
+    os.environ["SIGNING_POOL_WORKERS"] = str(args.pool_workers)
+    os.environ["SIGNED_URL_BATCH_MAX_KEYS"] = str(
+        max(args.batch_sizes + [args.http_batch_size])
+    )
+    sys.path.insert(0, str(APP_DIR))
+
+
+def _percentiles(samples):
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": pick(0.50) * 1000,
+        "p90_ms": pick(0.90) * 1000,
+        "p99_ms": pick(0.99) * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def bench_single(main, iterations):
+    samples = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        main.generate_signed_url(f"bench/single/{i}.mp4")
+        samples.append(time.perf_counter() - start)
+    result = _percentiles(samples)
+    result["urls_per_sec"] = iterations / sum(samples)
+    return result
+
+
+def bench_batch(main, batch_sizes, repeat):
+    results = []
+    for size in batch_sizes:
+        durations = []
+        for r in range(repeat):
+            keys = [f"bench/batch/{size}/{r}/{i}.mp4" for i in range(size)]
+            start = time.perf_counter()
+            main.generate_signed_urls(keys)
+            durations.append(time.perf_counter() - start)
+        best = min(durations)
+        results.append(
+            {
+                "batch_size": size,
+                "repeat": repeat,
+                "best_seconds": best,
+                "median_seconds": statistics.median(durations),
+                "urls_per_sec": size / best,
+            }
+        )
+    return results
+
+
+async def bench_http(main, requests, concurrency, batch_size):
+    import httpx
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        results = {}
+        for name, path, make_body in (
+            ("url", "/videos/url", lambda i: {"object_key": f"bench/http/{i}.mp4"}),
+            (
+                "urls",
+                "/videos/urls",
+                lambda i: {
+                    "object_keys": [
+                        f"bench/http/{i}/{j}.mp4" for j in range(batch_size)
+                    ]
+                },
+            ),
+        ):
+            samples = []
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def one(i):
+                async with semaphore:
+                    start = time.perf_counter()
+                    response = await client.post(path, json=make_body(i))
+                    response.raise_for_status()
+                    samples.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(requests)))
+            elapsed = time.perf_counter() - start
+            result = _percentiles(samples)
+            result["requests_per_sec"] = requests / elapsed
+            result["concurrency"] = concurrency
+            if name == "urls":
+                result["batch_size"] = batch_size
+                result["urls_per_sec"] = requests * batch_size / elapsed
+            results[name] = result
+        return results
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=APP_DIR, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="play_server signing benchmark")
+    parser.add_argument("--output", default="play_server_benchmark.json")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument(
+        "--batch-sizes", type=int, nargs="+", default=[1, 10, 100, 500, 1000]
+    )
+    parser.add_argument("--batch-repeat", type=int, default=5)
+    parser.add_argument("--http-requests", type=int, default=500)
+    parser.add_argument("--http-concurrency", type=int, default=16)
+    parser.add_argument("--http-batch-size", type=int, default=50)
+    parser.add_argument("--cache-size", type=int, default=0)
+    parser.add_argument("--pool-kind", choices=["thread", "process"], default="thread")
+    parser.add_argument("--pool-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    _configure_env(args)
+    import main as play_server
+
+    try:
+        report = {
+            "meta": {
+                "commit": _git_commit(),
+                "timestamp": datetime.datetime.utcnow().isoformat(),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "cpu_count": os.cpu_count(),
+                "args": vars(args),
+            },
+            "single": bench_single(play_server, args.iterations),
+            "batch": bench_batch(play_server, args.batch_sizes, args.batch_repeat),
+            "http": asyncio.run(
+                bench_http(
+                    play_server,
+                    args.http_requests,
+                    args.http_concurrency,
+                    args.http_batch_size,
+                )
+            ),
+        }
+    finally:
+        play_server.batch_signer.shutdown()
+
+    Path(args.output).write_text(json.dumps(report, indent=2))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
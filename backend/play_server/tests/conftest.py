@@ -0,0 +1,37 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+# main reads its settings at import time; use a throwaway key and domain.
+_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+os.environ.setdefault("CLOUDFRONT_DOMAIN", "https://cdn.invalid")
+os.environ.setdefault("KEY_PAIR_ID", "TESTKEYPAIR")
+os.environ.setdefault(
+    "S3_PRIVATE_KEY",
+    _key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    ).decode(),
+)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+
+@pytest.fixture
+def main():
+    import main as play_server
+
+    play_server.signed_url_cache.clear()
+    play_server.playlist_cache._entries.clear()
+    return play_server
+
+
+@pytest.fixture
+def client(main):
+    from fastapi.testclient import TestClient
+
+    return TestClient(main.app)
@@ -0,0 +1,39 @@
+import datetime
+
+from test_playlist import PARAMS, make_segments, serve
+
+
+def quantize(main, monkeypatch):
+    monkeypatch.setattr(main.settings, "SIGNED_URL_EXPIRY_BUCKET_SECONDS", 3600)
+
+
+def test_matching_etag_on_post_is_a_failed_precondition(main, client, monkeypatch):
+    quantize(main, monkeypatch)
+    body = {"object_keys": ["bb/1.ts", "bb/2.ts"]}
+    first = client.post("/videos/urls", json=body)
+    assert first.status_code == 200
+
+    repeat = client.post(
+        "/videos/urls", json=body, headers={"If-None-Match": first.headers["ETag"]}
+    )
+    assert repeat.status_code == 412
+    assert repeat.headers["ETag"] == first.headers["ETag"]
+
+    other = client.post("/videos/urls", json=body, headers={"If-None-Match": '"x"'})
+    assert other.status_code == 200
+
+
+def test_matching_etag_on_get_is_not_modified(main, client, monkeypatch):
+    quantize(main, monkeypatch)
+    serve(main, monkeypatch, make_segments(3))
+    end = (datetime.datetime.utcnow() - datetime.timedelta(hours=1)).isoformat()
+    params = dict(PARAMS, end=end)
+    first = client.get("/videos/playlist.m3u8", params=params)
+    assert first.status_code == 200
+
+    repeat = client.get(
+        "/videos/playlist.m3u8",
+        params=params,
+        headers={"If-None-Match": first.headers["ETag"]},
+    )
+    assert repeat.status_code == 304
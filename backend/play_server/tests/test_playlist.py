@@ -0,0 +1,102 @@
+import datetime
+
+from metadata import Segment
+
+T0 = datetime.datetime(2024, 1, 1)
+PARAMS = {"blackbox_uuid": "bb", "start": "2024-01-01T00:00:00"}
+
+
+def make_segments(count, duration=10):
+    return [
+        Segment(
+            id=f"{i:05d}",
+            object_key=f"bb/{i}.ts",
+            duration=duration,
+            stream_started_at=T0,
+            created_at=T0 + datetime.timedelta(seconds=i),
+            file_type="ts",
+        )
+        for i in range(count)
+    ]
+
+
+def serve(main, monkeypatch, segments):
+    async def fetch(blackbox_uuid, start, end, after, limit):
+        known = [segment.id for segment in segments]
+        index = 0 if after is None else known.index(after.id) + 1
+        return segments[index : index + limit]
+
+    monkeypatch.setattr(main.playlist_cache, "fetch_segments", fetch)
+    monkeypatch.setattr(main.playlist_cache, "refresh_seconds", 0)
+    signed = []
+    sign = main.batch_signer.sign
+
+    def counting_sign(urls, *args):
+        signed.extend(urls)
+        return sign(urls, *args)
+
+    monkeypatch.setattr(main.batch_signer, "sign", counting_sign)
+    return signed
+
+
+def test_repeat_and_append_polls_reuse_cached_urls(main, client, monkeypatch):
+    segments = make_segments(120)
+    signed = serve(main, monkeypatch, segments)
+
+    first = client.get("/videos/playlist.m3u8", params=PARAMS)
+    assert first.status_code == 200
+    assert len(signed) == 120
+
+    signed.clear()
+    repeat = client.get("/videos/playlist.m3u8", params=PARAMS)
+    assert signed == []
+    assert repeat.text == first.text
+
+    segments.extend(make_segments(121)[120:])
+    appended = client.get("/videos/playlist.m3u8", params=PARAMS)
+    assert signed == ["https://cdn.invalid/bb/120.ts"]
+    assert appended.text.count("#EXTINF") == 121
+
+
+def test_segment_urls_outlive_their_playback(main, client, monkeypatch):
+    segments = make_segments(30, duration=60)
+    serve(main, monkeypatch, segments)
+
+    now = datetime.datetime.utcnow()
+    urls = main.generate_playlist_urls(segments)
+    for i, (_, expire_time, _) in enumerate(urls):
+        playback_end = (i + 1) * 60 + main.settings.PLAYLIST_URL_MARGIN_SECONDS
+        assert expire_time - now >= datetime.timedelta(seconds=playback_end)
+
+
+def test_playlist_lists_only_playable_file_types(main, client, monkeypatch):
+    import metadata
+
+    rows = [
+        dict(
+            id=f"{i:05d}",
+            object_key=f"bb/{i}.{file_type}",
+            duration=10,
+            stream_started_at=T0,
+            created_at=T0 + datetime.timedelta(seconds=i),
+            file_type=file_type,
+        )
+        for i, file_type in enumerate(["ts", "mp4", "TS", "mp4", None])
+    ]
+
+    async def fetch(query, *args):
+        assert "file_type" in query
+        file_types, limit = args[7], args[6]
+        return [
+            {k: v for k, v in row.items() if k != "file_type"}
+            for row in rows
+            if row["file_type"] and row["file_type"].lower() in file_types
+        ][:limit]
+
+    monkeypatch.setattr(metadata.db, "fetch", fetch)
+    response = client.get("/videos/playlist.m3u8", params=PARAMS)
+    assert response.status_code == 200
+    assert "#EXT-X-VERSION:3" in response.text
+    assert "/bb/0.ts?" in response.text and "/bb/2.TS?" in response.text
+    assert ".mp4" not in response.text
+    assert response.text.count("#EXTINF") == 2
@@ -0,0 +1,31 @@
+import datetime
+
+from metadata import Segment
+
+
+def test_single_and_prefix_urls_keep_their_response_shape(client):
+    response = client.post("/videos/url", json={"object_key": "bb/1.ts"})
+    assert set(response.json()) == {"signed_url", "expire_time"}
+
+    response = client.post(
+        "/videos/urls/prefix", json={"prefix": "bb/", "object_keys": ["bb/1.ts"]}
+    )
+    assert set(response.json()["signed_urls"][0]) == {"signed_url", "expire_time"}
+
+    response = client.post("/videos/urls", json={"object_keys": ["bb/1.ts"]})
+    assert set(response.json()["signed_urls"][0]) == {"signed_url", "expire_time"}
+
+
+def test_selector_urls_carry_segment_metadata(main, client, monkeypatch):
+    started = datetime.datetime(2024, 1, 1)
+
+    async def fetch_page(*args, **kwargs):
+        return [Segment("1", "bb/1.ts", 10, started, None, None, "ts")]
+
+    monkeypatch.setattr(main, "fetch_segment_page", fetch_page)
+    response = client.post("/videos/urls", json={"blackbox_uuid": "bb"})
+    item = response.json()["signed_urls"][0]
+    assert item["object_key"] == "bb/1.ts"
+    assert item["duration"] == 10
+    assert item["file_size"] is None
+    assert item["stream_started_at"] == "2024-01-01T00:00:00"
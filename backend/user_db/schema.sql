@@ -38,6 +38,12 @@ CREATE TABLE
 -- blackbox_uuid 컬럼에 대한 인덱스 생성
 CREATE INDEX IF NOT EXISTS idx_blackbox_uuid ON metadata (blackbox_uuid);
 
+-- 삭제되지 않은 세그먼트 목록 조회(keyset pagination)용 부분 커버링 인덱스
+CREATE INDEX IF NOT EXISTS idx_metadata_blackbox_started_id
+    ON metadata (blackbox_uuid, stream_started_at, id)
+    INCLUDE (object_key, file_type, file_size, duration, created_at)
+    WHERE is_deleted = false;
+
 COMMENT ON TABLE metadata IS '영상 메타데이터를 저장하는 테이블';
 COMMENT ON COLUMN metadata.id IS '메타데이터 고유 ID';
 COMMENT ON COLUMN metadata.blackbox_uuid IS '참조하는 블랙박스의 UUID';
@@ -14,3 +14,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 
 application = get_asgi_application()
+
+# Only server processes load this module; management commands never spawn
+# the hashing workers.
+from users.hashing import hasherPool  # noqa: E402
+
+hasherPool.warm()
@@ -25,6 +25,7 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     "rest_framework",
+    "adrf",  # async DRF views
     "drf_spectacular",  # Add drf-spectacular
     "corsheaders",
     "users.apps.UsersConfig",
@@ -124,6 +125,31 @@ SESSION_COOKIE_DOMAIN = ".neves-box.com"
 SESSION_COOKIE_SAMESITE = "None"
 SESSION_COOKIE_SECURE = True
 
+# Verification/2FA codes live in the "codes" cache, not in sessions.
+# LocMemCache is per process; with several gunicorn workers or replicas set
+# CODE_STORE_BACKEND to a shared backend, e.g.
+# django.core.cache.backends.redis.RedisCache with CODE_STORE_LOCATION=redis://...
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "codes": {
+        "BACKEND": os.environ.get(
+            "CODE_STORE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("CODE_STORE_LOCATION", "auth-codes"),
+        "KEY_PREFIX": "auth-codes",
+    },
+    # Process-local uid -> email cache (users.email_lookup).
+    "emails": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "user-emails",
+        "TIMEOUT": int(os.environ.get("USER_EMAIL_CACHE_TTL", 60)),
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
+AUTH_CODE_LIFETIME_SECONDS = int(os.environ.get("AUTH_CODE_LIFETIME_SECONDS", 300))
+USER_EMAIL_CACHE_NEGATIVE_TTL = int(os.environ.get("USER_EMAIL_CACHE_NEGATIVE_TTL", 10))
+USER_EMAIL_BATCH_MAX = int(os.environ.get("USER_EMAIL_BATCH_MAX", 500))
+
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class UsersConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "users"
+
+    def ready(self):
+        from .email_lookup import invalidate_user_email
+
+        post_save.connect(invalidate_user_email, sender=self.get_model("User"))
+        post_delete.connect(invalidate_user_email, sender=self.get_model("User"))
@@ -0,0 +1,138 @@
+import hmac
+import secrets
+import string
+import time
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+
+"""
+인증 코드 저장소
+회원가입/로그인 인증 코드를 세션 테이블 대신 캐시(settings.CACHES["codes"])에
+이메일과 용도(purpose)별로 TTL과 함께 저장한다.
+요청한 브라우저에서만 인증을 완료할 수 있도록 서명된 쿠키의 nonce와 함께 검증한다.
+"""
+
+SIGNUP = "signup"
+LOGIN = "login"
+
+
+class AuthCode(NamedTuple):
+    code: str
+    nonce: str
+    expires_at: float
+    verified: bool = False
+
+    @property
+    def expired(self) -> bool:
+        return self.expires_at < time.time()
+
+
+class CodeStore:
+    def __init__(self, alias: str, lifetime_seconds: int, code_length: int = 5):
+        self.alias = alias
+        self.lifetime_seconds = lifetime_seconds
+        self.code_length = code_length
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def lifetime_minutes(self) -> int:
+        """Lifetime shown to users; rounded down so the code never expires early."""
+        return max(1, self.lifetime_seconds // 60)
+
+    @staticmethod
+    def _key(purpose: str, email: str) -> str:
+        return f"{purpose}:{email.lower()}"
+
+    @staticmethod
+    def _timeout(entry: AuthCode) -> int:
+        return max(1, int(entry.expires_at - time.time()) + 1)
+
+    def _new_entry(self) -> AuthCode:
+        return AuthCode(
+            code="".join(
+                secrets.choice(string.digits) for _ in range(self.code_length)
+            ),
+            nonce=secrets.token_urlsafe(16),
+            expires_at=time.time() + self.lifetime_seconds,
+        )
+
+    @staticmethod
+    def _match(value, nonce: Optional[str]) -> Optional[AuthCode]:
+        """Returns the entry only to the client holding its nonce."""
+        if value is None or not nonce:
+            return None
+        entry = AuthCode(*value)
+        if not hmac.compare_digest(entry.nonce, nonce):
+            return None
+        return entry
+
+    def issue(self, purpose: str, email: str) -> AuthCode:
+        entry = self._new_entry()
+        self.cache.set(self._key(purpose, email), tuple(entry), self._timeout(entry))
+        return entry
+
+    def get(self, purpose: str, email: str, nonce: Optional[str]) -> Optional[AuthCode]:
+        return self._match(self.cache.get(self._key(purpose, email)), nonce)
+
+    def mark_verified(self, purpose: str, email: str, entry: AuthCode):
+        entry = entry._replace(verified=True)
+        self.cache.set(self._key(purpose, email), tuple(entry), self._timeout(entry))
+
+    def delete(self, purpose: str, email: str):
+        self.cache.delete(self._key(purpose, email))
+
+    # Async variants for async views; they use the cache's native async API.
+    async def aissue(self, purpose: str, email: str) -> AuthCode:
+        entry = self._new_entry()
+        await self.cache.aset(
+            self._key(purpose, email), tuple(entry), self._timeout(entry)
+        )
+        return entry
+
+    async def aget(
+        self, purpose: str, email: str, nonce: Optional[str]
+    ) -> Optional[AuthCode]:
+        return self._match(await self.cache.aget(self._key(purpose, email)), nonce)
+
+    async def adelete(self, purpose: str, email: str):
+        await self.cache.adelete(self._key(purpose, email))
+
+    def cookie_name(self, purpose: str) -> str:
+        return f"{purpose}_flow"
+
+    def bind(self, response, purpose: str, entry: AuthCode):
+        response.set_signed_cookie(
+            self.cookie_name(purpose),
+            entry.nonce,
+            salt=self.cookie_name(purpose),
+            max_age=self.lifetime_seconds,
+            domain=settings.SESSION_COOKIE_DOMAIN,
+            secure=settings.SESSION_COOKIE_SECURE,
+            samesite=settings.SESSION_COOKIE_SAMESITE,
+            httponly=True,
+        )
+        return response
+
+    def nonce(self, request, purpose: str) -> Optional[str]:
+        return request.get_signed_cookie(
+            self.cookie_name(purpose),
+            default=None,
+            salt=self.cookie_name(purpose),
+            max_age=self.lifetime_seconds,
+        )
+
+    def unbind(self, response, purpose: str):
+        response.delete_cookie(
+            self.cookie_name(purpose),
+            domain=settings.SESSION_COOKIE_DOMAIN,
+            samesite=settings.SESSION_COOKIE_SAMESITE,
+        )
+        return response
+
+
+codeStore = CodeStore("codes", settings.AUTH_CODE_LIFETIME_SECONDS)
@@ -0,0 +1,85 @@
+import uuid
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import User
+
+"""
+uid -> 이메일 조회
+mail_server 알림 발송 시 호출되는 조회를 프로세스 로컬 캐시(settings.CACHES["emails"])를
+거쳐 처리하고, 캐시에 없는 uid만 한 번의 IN 쿼리로 uid/email 컬럼만 읽어 온다.
+없는 uid도 짧게 캐시한다. 이메일이 바뀌거나 사용자가 삭제되면 해당 uid 항목을 지운다
+(다른 프로세스의 캐시는 TTL이 지나야 갱신된다).
+USER_EMAIL_CACHE_TTL: 조회 결과 캐시 시간(초, 기본값: 60)
+USER_EMAIL_CACHE_NEGATIVE_TTL: 없는 uid 캐시 시간(초, 기본값: 10)
+USER_EMAIL_BATCH_MAX: POST /users/emails/ 한 번에 조회할 수 있는 uid 수 (기본값: 500)
+"""
+
+# Cached for uids that have no user; the cache returns None for absent keys.
+NOT_FOUND = ""
+
+
+def parse_uid(value) -> Optional[uuid.UUID]:
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        return None
+
+
+class EmailLookup:
+    def __init__(self, alias: str, negative_timeout: int):
+        self.alias = alias
+        self.negative_timeout = negative_timeout
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @staticmethod
+    def _key(uid: uuid.UUID) -> str:
+        return uid.hex
+
+    def get(self, uid: uuid.UUID) -> Optional[str]:
+        return self.get_many([uid]).get(uid)
+
+    def get_many(self, uids: Iterable[uuid.UUID]) -> Dict[uuid.UUID, str]:
+        """
+        Maps every known uid to its email; unknown uids are left out.
+        Cache misses are read in a single query.
+        """
+        keys = {self._key(uid): uid for uid in uids}
+        cached = self.cache.get_many(keys.keys())
+        found = {
+            keys[key]: email for key, email in cached.items() if email != NOT_FOUND
+        }
+        missing = [uid for key, uid in keys.items() if key not in cached]
+        if not missing:
+            return found
+
+        loaded = dict(User.objects.filter(uid__in=missing).values_list("uid", "email"))
+        found.update(loaded)
+        self.cache.set_many({self._key(uid): loaded[uid] for uid in loaded})
+        absent = [uid for uid in missing if uid not in loaded]
+        if absent:
+            self.cache.set_many(
+                {self._key(uid): NOT_FOUND for uid in absent}, self.negative_timeout
+            )
+        return found
+
+    def invalidate(self, uid: uuid.UUID):
+        self.cache.delete(self._key(uid))
+
+    def clear(self):
+        self.cache.clear()
+
+
+emailLookup = EmailLookup("emails", settings.USER_EMAIL_CACHE_NEGATIVE_TTL)
+
+
+def invalidate_user_email(sender, instance, update_fields=None, **kwargs):
+    """post_save/post_delete receiver for User."""
+    if update_fields is not None and "email" not in update_fields:
+        return
+    emailLookup.invalidate(instance.uid)
@@ -0,0 +1,139 @@
+import os
+import time
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from prometheus_client import Counter, Gauge, Histogram
+
+"""
+비밀번호 해시/검증을 요청 처리 루프 밖의 프로세스 풀에서 수행하기 위한 환경변수
+PASSWORD_HASH_WORKERS: 해시 전용 프로세스 수 (기본값: CPU 수 / WEB_CONCURRENCY, 최소 1)
+  gunicorn 워커마다 풀이 따로 생기므로 워커 수(WEB_CONCURRENCY)로 CPU를 나눈다.
+PASSWORD_HASH_MAX_PENDING: 대기 + 처리 중 작업 상한, 초과 시 429 응답 (기본값: 프로세스 수 x 4)
+"""
+
+PASSWORD_HASH_PENDING = Gauge(
+    "password_hash_pending", "Password hash jobs queued or running in the pool"
+)
+PASSWORD_HASH_REJECTED = Counter(
+    "password_hash_rejected", "Password hash jobs shed because the pool was full"
+)
+PASSWORD_HASH_DURATION = Histogram(
+    "password_hash_seconds",
+    "Time from submitting a password hash job until its result",
+    ["op"],
+)
+
+
+class HashPoolSaturated(Exception):
+    pass
+
+
+def _init_worker():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    from django.contrib.auth.hashers import get_hashers
+
+    get_hashers()
+
+
+def _warm_up():
+    return os.getpid()
+
+
+def _make_password(password):
+    from django.contrib.auth.hashers import make_password
+
+    return make_password(password)
+
+
+def _check_password(password, encoded):
+    from django.contrib.auth.hashers import check_password, make_password
+
+    # Mirrors AbstractBaseUser.check_password: a valid password stored with
+    # an outdated hasher is re-hashed with the preferred one.
+    updated = []
+    valid = check_password(
+        password, encoded, setter=lambda raw: updated.append(make_password(raw))
+    )
+    return valid, (updated[0] if updated else None)
+
+
+class PasswordHasherPool:
+    """
+    Runs Django password hashing in a bounded process pool so CPU-bound bcrypt
+    work never blocks the event loop. Callers get HashPoolSaturated instead of
+    queueing once max_pending jobs are outstanding.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._pid = None
+        self._executor = None
+
+    def _get_executor(self):
+        pid = os.getpid()
+        if self._pid != pid:
+            self._pid = pid
+            self._pending = 0
+            # spawn: forking a process that runs an event loop and threads is
+            # not safe.
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return self._executor
+
+    async def _run(self, op, func, *args):
+        with self._lock:
+            executor = self._get_executor()
+            if self._pending >= self.max_pending:
+                PASSWORD_HASH_REJECTED.inc()
+                raise HashPoolSaturated("password hashing pool is saturated")
+            self._pending += 1
+            PASSWORD_HASH_PENDING.inc()
+        start = time.time()
+        try:
+            return await asyncio.wrap_future(executor.submit(func, *args))
+        finally:
+            PASSWORD_HASH_DURATION.labels(op=op).observe(time.time() - start)
+            with self._lock:
+                self._pending -= 1
+                PASSWORD_HASH_PENDING.dec()
+
+    async def make_password(self, password: str) -> str:
+        return await self._run("make", _make_password, password)
+
+    async def check_password(self, password: str, encoded: str):
+        """Returns (valid, new_encoded); new_encoded is set when a rehash is due."""
+        return await self._run("check", _check_password, password, encoded)
+
+    def warm(self):
+        """Starts every worker process now instead of on the first logins."""
+        with self._lock:
+            executor = self._get_executor()
+        for _ in range(self.max_workers):
+            executor.submit(_warm_up)
+
+    def shutdown(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        self._pid = None
+
+
+_workers = int(
+    os.getenv(
+        "PASSWORD_HASH_WORKERS",
+        max(1, (os.cpu_count() or 1) // int(os.getenv("WEB_CONCURRENCY", 1))),
+    )
+)
+hasherPool = PasswordHasherPool(
+    max_workers=_workers,
+    max_pending=int(os.getenv("PASSWORD_HASH_MAX_PENDING", _workers * 4)),
+)
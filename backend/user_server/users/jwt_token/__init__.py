@@ -1,8 +1,14 @@
-from django.http import JsonResponse
-from rest_framework.decorators import api_view
-from .manager import jwtManager
+from django.http import HttpResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_safe
+from .manager import jwtManager, JWKS_MAX_AGE
 
 
-@api_view(["GET"])
+@require_safe
+@cache_control(public=True, max_age=JWKS_MAX_AGE)
+@condition(etag_func=lambda request: jwtManager.jwks[2])
 def jwks_view(request):
-    return JsonResponse(jwtManager.get_validation_key())
+    _, body, etag = jwtManager.jwks
+    response = HttpResponse(body, content_type="application/json")
+    response["ETag"] = etag
+    return response
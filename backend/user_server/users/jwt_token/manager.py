@@ -1,8 +1,11 @@
 import jwt
 import os
+import json
 import base64
+import hashlib
 import datetime
 import logging
+import threading
 from datetime import timedelta
 from zoneinfo import ZoneInfo
 
@@ -15,6 +18,11 @@ PRIVATE_KEY: PEM 형식의 RSA 개인키 (없을 경우 자동 생성)
 PUBLIC_KEY: PEM 형식의 RSA 공개키 (없을 경우 자동 생성)
 ISSUER: 토큰 발급자 (기본값: neves.com)
 TOKEN_LIFETIME_DAY: 토큰 유효기간 (기본값: 3일)
+JWT_KEY_ID: 서명키의 kid (기본값: simple)
+JWT_PUBLISHED_KEYS: 서명에는 쓰지 않고 JWKS에만 공개할 공개키, {"kid": "PEM"} 형식의 JSON
+    키 교체 시 새 키를 JWKS_MAX_AGE 이상 먼저 공개한 뒤 서명키로 바꾸고,
+    이전 키는 그 키로 서명한 토큰이 만료될 때까지 계속 공개한다.
+JWKS_MAX_AGE: JWKS 응답의 Cache-Control max-age (초, 기본값: 86400)
 """
 
 
@@ -62,13 +70,28 @@ def to_base64url(n: int):
     return base64.urlsafe_b64encode(num_bytes).rstrip(b"=").decode("ascii")
 
 
+def load_published_keys():
+    published = json.loads(os.environ.get("JWT_PUBLISHED_KEYS", "{}"))
+    return {
+        kid: serialization.load_pem_public_key(pem.encode("utf-8"))
+        for kid, pem in published.items()
+    }
+
+
 private_key, public_key = generate_rsa_keys()
 ISSUER = os.environ.get("ISSUER", "neves.com")
 TOKEN_LIFETIME_DAY = int(os.environ.get("TOKEN_LIFETIME_DAY", 3))
-KEY_ID = "simple"
+KEY_ID = os.environ.get("JWT_KEY_ID", "simple")
+JWKS_MAX_AGE = int(os.environ.get("JWKS_MAX_AGE", 86400))
 
 
 class JwtTokenManager:
+    """
+    Signs tokens with one key and publishes every active public key in a JWKS
+    document. The document is serialized once per key change, together with
+    its ETag, so serving it costs no key math.
+    """
+
     def __init__(
         self,
         private_key: rsa.RSAPrivateKey,
@@ -77,27 +100,75 @@ class JwtTokenManager:
         key_id: str,
         issuer: str,
         lifetime_day: int,
+        published_keys: dict = None,
     ):
-        self.private_key = private_key
-        self.public_key = public_key
         self.algorithm = algorithm
-        self.key_id = key_id
         self.issuer = issuer
         self.lifetime = timedelta(days=lifetime_day)
+        self._lock = threading.Lock()
+        self.public_keys = dict(published_keys or {})
+        self.private_key = private_key
+        self.public_key = public_key
+        self.key_id = key_id
+        self.public_keys[key_id] = public_key
+        self._publish()
 
-    def get_validation_key(self):
+    def _jwk(self, key_id: str, public_key: rsa.RSAPublicKey):
+        numbers = public_key.public_numbers()
         return {
+            "kty": "RSA",
+            "kid": key_id,
+            "use": "sig",
+            "alg": self.algorithm,
+            "n": to_base64url(numbers.n),
+            "e": to_base64url(numbers.e),
+        }
+
+    def _publish(self):
+        jwks = {
             "keys": [
-                {
-                    "kty": "RSA",
-                    "kid": self.key_id,
-                    "use": "sig",
-                    "alg": self.algorithm,
-                    "n": to_base64url(self.public_key.public_numbers().n),
-                    "e": to_base64url(self.public_key.public_numbers().e),
-                }
+                self._jwk(key_id, public_key)
+                for key_id, public_key in sorted(self.public_keys.items())
             ]
         }
+        body = json.dumps(jwks, separators=(",", ":")).encode("utf-8")
+        # Derived from the content only, so every worker sends the same ETag.
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        self.jwks = (jwks, body, etag)
+
+    def get_validation_key(self):
+        return self.jwks[0]
+
+    def add_key(self, key_id: str, public_key: rsa.RSAPublicKey):
+        """Publishes a verification-only key, e.g. the next signing key."""
+        with self._lock:
+            self.public_keys[key_id] = public_key
+            self._publish()
+
+    def rotate(
+        self,
+        key_id: str,
+        private_key: rsa.RSAPrivateKey,
+        public_key: rsa.RSAPublicKey = None,
+    ):
+        """
+        Signs new tokens with key_id. The previous signing key stays published
+        until retire() so that tokens it signed keep verifying.
+        """
+        public_key = public_key or private_key.public_key()
+        with self._lock:
+            self.public_keys[key_id] = public_key
+            self.private_key = private_key
+            self.public_key = public_key
+            self.key_id = key_id
+            self._publish()
+
+    def retire(self, key_id: str):
+        with self._lock:
+            if key_id == self.key_id:
+                raise ValueError("The signing key cannot be retired")
+            if self.public_keys.pop(key_id, None) is not None:
+                self._publish()
 
     def create_token(self, user_id: str, payload_data: dict = {}) -> str:
         now = datetime.datetime.now(ZoneInfo("Asia/Seoul"))
@@ -113,18 +184,26 @@ class JwtTokenManager:
 
         payload.update(payload_data)
 
+        with self._lock:
+            key_id, private_key = self.key_id, self.private_key
         headers = {
-            "kid": self.key_id,
+            "kid": key_id,
             "alg": self.algorithm,
         }
 
         encoded_token = jwt.encode(
-            payload, self.private_key, algorithm=self.algorithm, headers=headers
+            payload, private_key, algorithm=self.algorithm, headers=headers
         )
 
         return encoded_token
 
 
 jwtManager = JwtTokenManager(
-    private_key, public_key, "RS256", KEY_ID, ISSUER, TOKEN_LIFETIME_DAY
+    private_key,
+    public_key,
+    "RS256",
+    KEY_ID,
+    ISSUER,
+    TOKEN_LIFETIME_DAY,
+    published_keys=load_published_keys(),
 )
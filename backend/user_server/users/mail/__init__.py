@@ -0,0 +1 @@
+from .dispatcher import mailDispatcher
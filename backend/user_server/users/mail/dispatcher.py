@@ -0,0 +1,157 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from prometheus_client import Counter, Gauge, Histogram
+
+"""
+메일 서버 호출을 요청 처리 경로 밖에서 수행하기 위한 환경변수
+MAIL_API_URL: 메일 서버 주소 (기본값: http://mail-server:8000)
+MAIL_DISPATCH_WORKERS: 백그라운드 발송 스레드 수 (기본값: 4)
+MAIL_DISPATCH_MAX_PENDING: 대기 가능한 최대 발송 건수 (기본값: 1000)
+MAIL_DISPATCH_MAX_ATTEMPTS: 발송 최대 시도 횟수 (기본값: 4)
+MAIL_DISPATCH_RETRY_DELAY: 첫 재시도 대기 시간(초), 이후 2배씩 증가 (기본값: 1)
+MAIL_DISPATCH_TIMEOUT: 메일 서버 요청 타임아웃(초) (기본값: 5)
+"""
+
+logger = logging.getLogger(__name__)
+
+MAIL_DISPATCH = Counter(
+    "user_mail_dispatch", "Mail dispatch attempts by outcome", ["format", "outcome"]
+)
+MAIL_DISPATCH_PENDING = Gauge(
+    "user_mail_dispatch_pending", "Mails queued or in flight to the mail server"
+)
+MAIL_DISPATCH_DURATION = Histogram(
+    "user_mail_dispatch_seconds", "Duration of one request to the mail server"
+)
+
+
+class MailDispatcher:
+    """
+    Sends mail requests to the mail server from a background thread pool over
+    a pooled keep-alive requests.Session. Failed requests are retried with
+    exponential backoff; the final outcome is only reported through logs and
+    metrics, never through the user's request.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        max_workers: int,
+        max_pending: int,
+        max_attempts: int,
+        retry_delay: float,
+        timeout: float,
+    ):
+        self.base_url = base_url
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._pid = None
+        self._executor = None
+        self._session = None
+
+    def _ensure_started(self):
+        # gunicorn forks workers after import; threads and sockets must be
+        # created in the process that uses them.
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        self._pid = pid
+        self._pending = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="mail-dispatch"
+        )
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=self.max_workers, max_retries=0
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        self._session = session
+
+    def dispatch(self, to: str, format: str, parameters: list) -> bool:
+        """
+        Queues a mail for background delivery. Returns False without queueing
+        when max_pending mails are already waiting.
+        """
+        with self._lock:
+            self._ensure_started()
+            if self._pending >= self.max_pending:
+                MAIL_DISPATCH.labels(format=format, outcome="rejected").inc()
+                return False
+            self._pending += 1
+            MAIL_DISPATCH_PENDING.inc()
+        payload = {"to": to, "format": format, "parameters": parameters}
+        self._executor.submit(self._send, payload, 1)
+        return True
+
+    def _send(self, payload: dict, attempt: int):
+        format = payload["format"]
+        start = time.time()
+        retrying = False
+        try:
+            response = self._session.post(
+                self.base_url + "/email/users", json=payload, timeout=self.timeout
+            )
+            if response.status_code not in (200, 202):
+                raise requests.exceptions.HTTPError(
+                    f"{response.status_code} {response.text}"
+                )
+        except requests.exceptions.RequestException as e:
+            MAIL_DISPATCH_DURATION.observe(time.time() - start)
+            if attempt < self.max_attempts:
+                delay = self.retry_delay * 2 ** (attempt - 1)
+                logger.warning(
+                    "mail dispatch to %s failed (attempt %d), retrying in %.1fs: %s",
+                    payload["to"],
+                    attempt,
+                    delay,
+                    e,
+                )
+                MAIL_DISPATCH.labels(format=format, outcome="retry").inc()
+                timer = threading.Timer(
+                    delay, self._executor.submit, (self._send, payload, attempt + 1)
+                )
+                timer.daemon = True
+                timer.start()
+                retrying = True
+                return
+            logger.error(
+                "mail dispatch to %s failed after %d attempts: %s",
+                payload["to"],
+                attempt,
+                e,
+            )
+            MAIL_DISPATCH.labels(format=format, outcome="failed").inc()
+        except Exception as e:
+            logger.exception("mail dispatch to %s failed: %s", payload["to"], e)
+            MAIL_DISPATCH.labels(format=format, outcome="failed").inc()
+        else:
+            MAIL_DISPATCH_DURATION.observe(time.time() - start)
+            MAIL_DISPATCH.labels(format=format, outcome="sent").inc()
+        finally:
+            # The slot is only kept while a retry is scheduled.
+            if not retrying:
+                with self._lock:
+                    self._pending -= 1
+                    MAIL_DISPATCH_PENDING.dec()
+
+
+mailDispatcher = MailDispatcher(
+    os.getenv("MAIL_API_URL", "http://mail-server:8000"),
+    max_workers=int(os.getenv("MAIL_DISPATCH_WORKERS", 4)),
+    max_pending=int(os.getenv("MAIL_DISPATCH_MAX_PENDING", 1000)),
+    max_attempts=int(os.getenv("MAIL_DISPATCH_MAX_ATTEMPTS", 4)),
+    retry_delay=float(os.getenv("MAIL_DISPATCH_RETRY_DELAY", 1)),
+    timeout=float(os.getenv("MAIL_DISPATCH_TIMEOUT", 5)),
+)
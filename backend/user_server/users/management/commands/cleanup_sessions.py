@@ -0,0 +1,54 @@
+import time
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes django_session rows in small batches. By default only expired "
+        "rows are removed; --all also removes live rows left over from the "
+        "session-based verification flow."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.1,
+            help="Seconds to pause between batches to limit database load.",
+        )
+        parser.add_argument(
+            "--all", action="store_true", help="Delete every session row."
+        )
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        queryset = Session.objects.all()
+        if not options["all"]:
+            queryset = queryset.filter(expire_date__lt=timezone.now())
+
+        if options["dry_run"]:
+            self.stdout.write(f"{queryset.count()} session rows would be deleted")
+            return
+
+        deleted = 0
+        while True:
+            keys = list(
+                queryset.order_by("session_key").values_list("session_key", flat=True)[
+                    :batch_size
+                ]
+            )
+            if not keys:
+                break
+            count, _ = Session.objects.filter(session_key__in=keys).delete()
+            deleted += count
+            self.stdout.write(f"deleted {deleted} session rows")
+            if len(keys) < batch_size:
+                break
+            time.sleep(options["sleep"])
+
+        self.stdout.write(self.style.SUCCESS(f"{deleted} session rows deleted"))
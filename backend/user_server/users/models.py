@@ -18,6 +18,15 @@ class UserManager(BaseUserManager):
         user.save(using=self._db)
         return user
 
+    async def acreate_user_with_hash(self, email, password_hash, **extra_fields):
+        """Async create_user for a password already hashed off the event loop."""
+        if not email:
+            raise ValueError("The Email field must be set")
+        email = self.normalize_email(email)
+        user = self.model(email=email, password=password_hash, **extra_fields)
+        await user.asave(using=self._db)
+        return user
+
 
 class User(AbstractBaseUser, PermissionsMixin):
     uid = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
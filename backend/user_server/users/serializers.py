@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import User
 
@@ -6,6 +7,14 @@ class EmailSerializer(serializers.Serializer):
     email = serializers.EmailField()
 
 
+class UidListSerializer(serializers.Serializer):
+    uids = serializers.ListField(
+        child=serializers.CharField(),
+        allow_empty=False,
+        max_length=settings.USER_EMAIL_BATCH_MAX,
+    )
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -1,21 +1,20 @@
 from rest_framework.decorators import api_view
+from adrf.decorators import api_view as async_api_view
 from rest_framework.response import Response
 from rest_framework import status
 from .models import User
 from .serializers import (
     EmailSerializer,
+    UidListSerializer,
     UserCreateSerializer,
     VerifyEmailSerializer,
 )
 from drf_spectacular.utils import extend_schema
-import random
-import string
-import os
-import requests
-from django.utils import timezone
-from datetime import timedelta
-from django.contrib.auth import authenticate
 from .jwt_token.manager import jwtManager
+from .mail import mailDispatcher
+from .code_store import codeStore, SIGNUP, LOGIN
+from .hashing import hasherPool, HashPoolSaturated
+from .email_lookup import emailLookup, parse_uid
 
 
 @api_view(["GET"])
@@ -46,18 +45,88 @@ def get_email(request):
             {"error": "uid parameter is missing"}, status=status.HTTP_400_BAD_REQUEST
         )
 
-    try:
-        user = User.objects.get(uid=uid)
-        return Response({"email": user.email}, status=status.HTTP_200_OK)
-    except User.DoesNotExist:
-        return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
-    except ValueError:
+    uid = parse_uid(uid)
+    if uid is None:
         return Response(
             {"error": "Invalid UID format"}, status=status.HTTP_400_BAD_REQUEST
         )
 
+    email = emailLookup.get(uid)
+    if email is None:
+        return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
+    return Response({"email": email}, status=status.HTTP_200_OK)
 
-mail_server_url = os.getenv("MAIL_API_URL", "http://mail-server:8000")
+
+@extend_schema(
+    request=UidListSerializer,
+    responses={
+        200: {
+            "description": "Emails by uid; unknown or malformed uids are listed in missing."
+        },
+        400: {"description": "Bad Request (e.g., missing or too many uids)."},
+    },
+)
+@api_view(["POST"])
+def get_emails(request):
+    """
+    Bulk version of get_email for mail_server: every uid not already cached is
+    looked up in a single query.
+    """
+    serializer = UidListSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    requested = {}
+    missing = []
+    for uid in dict.fromkeys(serializer.validated_data["uids"]):
+        parsed = parse_uid(uid)
+        if parsed is None:
+            missing.append(uid)
+        else:
+            requested[uid] = parsed
+
+    found = emailLookup.get_many(requested.values())
+    emails = {}
+    for uid, parsed in requested.items():
+        if parsed in found:
+            emails[uid] = found[parsed]
+        else:
+            missing.append(uid)
+    return Response({"emails": emails, "missing": missing}, status=status.HTTP_200_OK)
+
+
+def hash_pool_saturated_response():
+    return Response(
+        {"error": "요청이 많아 처리할 수 없습니다. 잠시 후 다시 시도해주세요."},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={"Retry-After": "1"},
+    )
+
+
+async def authenticate_off_loop(email, password):
+    """
+    authenticate() for async views: the user is loaded with the async ORM and
+    the password is checked in the hashing process pool.
+    """
+    user = await User.objects.filter(email=email).afirst()
+    if user is None:
+        # Hash anyway so unknown emails take as long as wrong passwords.
+        await hasherPool.make_password(password)
+        return None
+    valid, new_hash = await hasherPool.check_password(password, user.password)
+    if not valid or not getattr(user, "is_active", True):
+        return None
+    if new_hash:
+        user.password = new_hash
+        await user.asave(update_fields=["password"])
+    return user
+
+
+def mail_queue_full_response():
+    return Response(
+        {"error": "메일 발송 요청이 많습니다. 잠시 후 다시 시도해주세요."},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
 
 
 @extend_schema(
@@ -65,7 +134,7 @@ mail_server_url = os.getenv("MAIL_API_URL", "http://mail-server:8000")
     responses={
         200: {"description": "Verification code sent successfully"},
         400: {"description": "Bad Request (e.g., invalid data, email exists)"},
-        500: {"description": "Mail server error"},
+        503: {"description": "Mail dispatch queue is full"},
     },
 )
 @api_view(["POST"])
@@ -85,42 +154,22 @@ def verify_email(request):
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    verification_code = "".join(random.choices(string.digits, k=5))
-    code_expiry = timezone.now() + timedelta(minutes=5)
-
-    request.session["verification_email"] = email
-    request.session["verification_code"] = verification_code
-    request.session["code_expiry"] = code_expiry.isoformat()
-    request.session["is_authenticated"] = False
+    entry = codeStore.issue(SIGNUP, email)
 
-    try:
-        response = requests.post(
-            mail_server_url + "/email/users",
-            json={
-                "to": email,
-                "format": "SIGNUP_AUTH",
-                "parameters": [verification_code],
-            },
-            timeout=15,
-        )
-        if response.status_code != 200:
-            return Response(
-                {
-                    "error": "메일 서버에서 이메일 발송에 실패했습니다.",
-                    "detail": response.text,
-                },
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            )
-    except requests.exceptions.RequestException as e:
-        return Response(
-            {"error": "메일 서버에 연결할 수 없습니다.", "detail": str(e)},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        )
+    if not mailDispatcher.dispatch(
+        email, "SIGNUP_AUTH", [entry.code, str(codeStore.lifetime_minutes)]
+    ):
+        codeStore.delete(SIGNUP, email)
+        return mail_queue_full_response()
 
-    return Response(
-        {"message": "인증 코드가 이메일로 발송되었습니다. 5분 안에 입력해주세요."},
+    response = Response(
+        {
+            "message": "인증 코드가 이메일로 발송되었습니다. "
+            f"{codeStore.lifetime_minutes}분 안에 입력해주세요."
+        },
         status=status.HTTP_200_OK,
     )
+    return codeStore.bind(response, SIGNUP, entry)
 
 
 @extend_schema(
@@ -142,48 +191,26 @@ def confirm_email(request):
     email = serializer.validated_data["email"]
     code = serializer.validated_data["code"]
 
-    session_email = request.session.get("verification_email")
-    session_code = request.session.get("verification_code")
-    session_expiry_str = request.session.get("code_expiry")
-
-    if (
-        not all([session_email, session_code, session_expiry_str])
-        or email != session_email
-    ):
+    entry = codeStore.get(SIGNUP, email, codeStore.nonce(request, SIGNUP))
+    if entry is None or entry.verified:
         return Response(
-            {
-                "error": f"인증 정보가 유효하지 않습니다. 다시 시도해주세요. {session_email} {session_code} {session_expiry_str}",
-                "input": f"{session_email} {session_code} {session_expiry_str}",
-            },
+            {"error": "인증 정보가 유효하지 않습니다. 다시 시도해주세요."},
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    code_expiry = timezone.datetime.fromisoformat(session_expiry_str)
-    if code_expiry < timezone.now():
-        try:
-            del request.session["verification_email"]
-            del request.session["verification_code"]
-            del request.session["code_expiry"]
-            del request.session["is_authenticated"]
-        except KeyError:
-            pass
+    if entry.expired:
+        codeStore.delete(SIGNUP, email)
         return Response(
             {"error": "인증 코드가 만료되었습니다."}, status=status.HTTP_400_BAD_REQUEST
         )
 
-    if session_code != code:
+    if entry.code != code:
         return Response(
             {"error": "인증 코드가 올바르지 않습니다."},
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    request.session["is_authenticated"] = True
-    request.session["signup_expiry"] = request.session["code_expiry"]
-
-    try:
-        del request.session["verification_code"]
-    except KeyError:
-        pass
+    codeStore.mark_verified(SIGNUP, email, entry)
 
     return Response(
         {"message": "이메일 인증이 완료되었습니다."},
@@ -196,10 +223,11 @@ def confirm_email(request):
     responses={
         201: {"description": "User created successfully"},
         400: {"description": "Bad Request (e.g., email not verified, expired)"},
+        429: {"description": "Password hashing pool is saturated"},
     },
 )
-@api_view(["POST"])
-def signup(request):
+@async_api_view(["POST"])
+async def signup(request):
     """
     Creates a new user after email verification.
     """
@@ -210,21 +238,15 @@ def signup(request):
     email = serializer.validated_data["email"]
     password = serializer.validated_data["password"]
 
-    session_email = request.session.get("verification_email")
-    is_authenticated = request.session.get("is_authenticated")
-    signup_expiry_str = request.session.get("signup_expiry")
-
-    if (
-        not all([session_email, is_authenticated, signup_expiry_str])
-        or email != session_email
-    ):
+    entry = await codeStore.aget(SIGNUP, email, codeStore.nonce(request, SIGNUP))
+    if entry is None or not entry.verified:
         return Response(
             {"error": "이메일 인증이 필요합니다."},
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    signup_expiry = timezone.datetime.fromisoformat(signup_expiry_str)
-    if signup_expiry < timezone.now():
+    if entry.expired:
+        await codeStore.adelete(SIGNUP, email)
         return Response(
             {
                 "error": "회원가입 기간이 만료되었습니다. 다시 이메일 인증을 시도해주세요."
@@ -232,20 +254,18 @@ def signup(request):
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    user = User.objects.create_user(email=email, password=password)
-
     try:
-        del request.session["verification_email"]
-        del request.session["is_authenticated"]
-        del request.session["signup_expiry"]
-        del request.session["code_expiry"]
-    except KeyError:
-        pass
+        password_hash = await hasherPool.make_password(password)
+    except HashPoolSaturated:
+        return hash_pool_saturated_response()
+    user = await User.objects.acreate_user_with_hash(email, password_hash)
+    await codeStore.adelete(SIGNUP, email)
 
-    return Response(
+    response = Response(
         {"message": "회원가입이 성공적으로 완료되었습니다.", "uid": user.uid},
         status=status.HTTP_201_CREATED,
     )
+    return codeStore.unbind(response, SIGNUP)
 
 
 @extend_schema(
@@ -254,12 +274,13 @@ def signup(request):
         200: {"description": "2FA code sent to your email."},
         400: {"description": "Invalid data."},
         401: {"description": "Invalid credentials."},
-        500: {"description": "Mail server error."},
+        429: {"description": "Password hashing pool is saturated."},
+        503: {"description": "Mail dispatch queue is full."},
     },
     summary="Login Step 1: Password Authentication",
 )
-@api_view(["POST"])
-def login_password(request):
+@async_api_view(["POST"])
+async def login_password(request):
     """
     Authenticates a user with email and password.
     If successful, generates and sends a 5-digit 2FA code to the user's email.
@@ -271,50 +292,31 @@ def login_password(request):
     email = serializer.validated_data["email"]
     password = serializer.validated_data["password"]
 
-    user = authenticate(request, email=email, password=password)
+    try:
+        user = await authenticate_off_loop(email, password)
+    except HashPoolSaturated:
+        return hash_pool_saturated_response()
     if user is None:
         return Response(
             {"error": "잘못된 이메일 또는 비밀번호입니다."},
             status=status.HTTP_401_UNAUTHORIZED,
         )
 
-    # Generate 5-digit 2FA code and store in session
-    verification_code = "".join(random.choices(string.digits, k=5))
-    code_expiry = timezone.now() + timedelta(minutes=5)
-
-    request.session["login_email"] = email
-    request.session["login_code"] = verification_code
-    request.session["login_expiry"] = code_expiry.isoformat()
+    # Generate 5-digit 2FA code and store it in the code store
+    entry = await codeStore.aissue(LOGIN, email)
 
-    # Send email with the 2FA code
-    try:
-        response = requests.post(
-            mail_server_url + "/email/users",
-            json={
-                "to": email,
-                "format": "2FA_AUTH",
-                "parameters": [verification_code],
-            },
-            timeout=15,
-        )
-        if response.status_code != 200:
-            return Response(
-                {
-                    "error": "메일 서버에서 이메일 발송에 실패했습니다.",
-                    "detail": response.text,
-                },
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            )
-    except requests.exceptions.RequestException as e:
-        return Response(
-            {"error": "메일 서버에 연결할 수 없습니다.", "detail": str(e)},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        )
+    # Send email with the 2FA code in the background
+    if not mailDispatcher.dispatch(
+        email, "2FA_AUTH", [entry.code, str(codeStore.lifetime_minutes)]
+    ):
+        await codeStore.adelete(LOGIN, email)
+        return mail_queue_full_response()
 
-    return Response(
+    response = Response(
         {"message": "2단계 인증 코드가 이메일로 발송되었습니다."},
         status=status.HTTP_200_OK,
     )
+    return codeStore.bind(response, LOGIN, entry)
 
 
 @extend_schema(
@@ -329,7 +331,7 @@ def login_password(request):
 @api_view(["POST"])
 def login_verify(request):
     """
-    Verifies the 2FA code from session and issues JWT access and refresh tokens.
+    Verifies the 2FA code from the code store and issues JWT access and refresh tokens.
     """
     serializer = VerifyEmailSerializer(data=request.data)
     if not serializer.is_valid():
@@ -338,33 +340,21 @@ def login_verify(request):
     email = serializer.validated_data["email"]
     code = serializer.validated_data["code"]
 
-    session_email = request.session.get("login_email")
-    session_code = request.session.get("login_code")
-    session_expiry_str = request.session.get("login_expiry")
-
-    if (
-        not all([session_email, session_code, session_expiry_str])
-        or email != session_email
-    ):
+    entry = codeStore.get(LOGIN, email, codeStore.nonce(request, LOGIN))
+    if entry is None:
         return Response(
             {"error": "인증 정보가 유효하지 않습니다. 다시 시도해주세요."},
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    if session_code != code:
+    if entry.code != code:
         return Response(
             {"error": "2단계 인증 코드가 잘못되었습니다."},
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    code_expiry = timezone.datetime.fromisoformat(session_expiry_str)
-    if code_expiry < timezone.now():
-        try:
-            del request.session["login_email"]
-            del request.session["login_code"]
-            del request.session["login_expiry"]
-        except KeyError:
-            pass
+    if entry.expired:
+        codeStore.delete(LOGIN, email)
         return Response(
             {"error": "2단계 인증 코드가 만료되었습니다."},
             status=status.HTTP_400_BAD_REQUEST,
@@ -372,27 +362,23 @@ def login_verify(request):
 
     # Verification successful, get user and generate JWT
     try:
-        user = User.objects.get(email=session_email)
+        user = User.objects.get(email=email)
     except User.DoesNotExist:
         return Response(
             {"error": "사용자를 찾을 수 없습니다."}, status=status.HTTP_404_NOT_FOUND
         )
 
-    # Clear the session data
-    try:
-        del request.session["login_email"]
-        del request.session["login_code"]
-        del request.session["login_expiry"]
-    except KeyError:
-        pass
+    # Clear the code
+    codeStore.delete(LOGIN, email)
 
     # Generate JWT
     token = jwtManager.create_token(str(user.uid))
 
-    return Response(
+    response = Response(
         {
             "message": "로그인이 완료되었습니다.",
             "token": str(token),
         },
         status=status.HTTP_200_OK,
     )
+    return codeStore.unbind(response, LOGIN)